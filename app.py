@@ -1,16 +1,44 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
+from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 import uuid
 import os
-import shutil
+import hashlib
 import traceback
-from inference import process_pdf_and_summarize
+import threading
+import json
+import asyncio
+from inference import process_pdf_and_summarize, PIPELINE_VERSION, SUMMARY_TIERS, TIER_STAGES
+from models.embedding_cache import embedding_cache
+from models.keyphrase_extraction import KEYPHRASE_MODE, KEYPHRASE_MAX_CANDIDATES
+from result_cache import make_result_cache
+from background_tasks import get_job_backend
+from executor import pipeline_executor, ExecutorSaturated
+from models import registry
+from models.instrumentation import metrics_registry
+from models.embeddings import encoder_scheduler
+from document_state import document_states
+from batch import iter_batch_summaries, list_pdfs
+
+# Load models at startup rather than on the first request
+WARMUP_ON_STARTUP = os.environ.get("PDFSUM_WARMUP", "1") == "1"
+
+@asynccontextmanager
+async def lifespan(app):
+    if WARMUP_ON_STARTUP:
+        print("🔥 Warming up models...")
+        timings = await run_in_threadpool(registry.warm_up)
+        print(f"✅ Models ready: {timings}")
+    yield
 
 app = FastAPI(
     title="Academic PDF Summarization API",
     description="Extract coherent summaries from academic papers and long documents",
-    version="2.0"
+    version="2.0",
+    lifespan=lifespan
 )
 
 # CORS
@@ -25,6 +53,22 @@ app.add_middleware(
 UPLOAD_DIR = "./data/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+# POST /batch may read server-side directories under this root only; unset disables it
+BATCH_ROOT = os.environ.get("PDFSUM_BATCH_ROOT")
+# Seconds between SSE comment lines while a stage runs, so idle proxies keep the stream open
+STREAM_KEEPALIVE = float(os.environ.get("STREAM_KEEPALIVE", 15))
+# Batches running at once; each one keeps the encoder busy on its own
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 1))
+batch_slots = threading.BoundedSemaphore(BATCH_CONCURRENCY)
+
+# Results from a quantized encoder must not be served for the fp32 one, and vice versa;
+# the same goes for keyphrases from the other keyphrase mode
+result_cache = make_result_cache(
+    f"{PIPELINE_VERSION}:{registry.embedding_model_key()}:kp-{KEYPHRASE_MODE}-{KEYPHRASE_MAX_CANDIDATES}"
+)
+
 @app.get("/")
 def read_root():
     return {
@@ -32,7 +76,12 @@ def read_root():
         "status": "running",
         "endpoints": {
             "POST /upload": "Upload PDF and get extractive summary",
-            "GET /health": "Health check"
+            "POST /upload/stream": "Upload PDF, stream progress events and the summary (SSE)",
+            "POST /jobs": "Queue a PDF for summarization, returns a job id",
+            "GET /jobs/{job_id}": "Job status, progress and result",
+            "POST /batch": "Summarize many PDFs, streamed back as JSON lines",
+            "GET /health": "Health check",
+            "GET /metrics": "Prometheus metrics"
         },
         "features": [
             "Keyphrase-weighted embeddings",
@@ -49,27 +98,44 @@ def health_check():
     return {
         "status": "healthy",
         "cuda_available": torch.cuda.is_available(),
-        "device": "cuda" if torch.cuda.is_available() else "cpu"
+        "device": "cuda" if torch.cuda.is_available() else "cpu",
+        "embedding_cache": embedding_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "executor": pipeline_executor.stats(),
+        "document_states": document_states.stats(),
+        "encoder_scheduler": encoder_scheduler.stats() if encoder_scheduler else {"enabled": False},
+        "models": registry.memory_report()
     }
 
-@app.post("/upload")
-async def upload_pdf(
-    file: UploadFile = File(...),
-    summary_sentences: int = 5
-):
-    """
-    Upload a PDF and receive an extractive summary
-    
-    Parameters:
-    - file: PDF document (max 50MB)
-    - summary_sentences: Number of sentences (3-10, default: 5)
-    
-    Returns:
-    - summary: Coherent extractive summary
-    - keyphrases: Key concepts from document
-    - stats: Processing statistics
-    """
-    
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Pipeline, cache and executor metrics in the Prometheus text format"""
+    cache_stats = embedding_cache.stats()
+    executor_stats = pipeline_executor.stats()
+    counters = {
+        "pdfsum_embedding_cache_hits": ("Embedding cache hits since start", cache_stats["hits"]),
+        "pdfsum_embedding_cache_misses": ("Embedding cache misses since start", cache_stats["misses"]),
+        "pdfsum_executor_rejected": ("Pipeline calls rejected since start", executor_stats["rejected"]),
+    }
+    gauges = {
+        "pdfsum_embedding_cache_entries": ("Embeddings held in memory", cache_stats["memory_entries"]),
+        "pdfsum_embedding_cache_mb": ("Megabytes of embeddings held in memory", cache_stats["memory_mb"]),
+        "pdfsum_executor_in_flight": ("Pipeline calls running", executor_stats["in_flight"]),
+        "pdfsum_executor_queued": ("Pipeline calls waiting for a worker", executor_stats["queued"]),
+    }
+    if encoder_scheduler is not None:
+        scheduler_stats = encoder_scheduler.stats()
+        gauges.update({
+            "pdfsum_encoder_queue_depth": ("Texts waiting for the encoder scheduler", scheduler_stats["queue_depth"]),
+            "pdfsum_encoder_max_queue_depth": ("Deepest encoder queue since start", scheduler_stats["max_queue_depth"]),
+            "pdfsum_encoder_batch_fill": ("Mean fraction of max_batch used per batch", scheduler_stats["mean_batch_fill"]),
+            "pdfsum_encoder_mean_wait_ms": ("Mean time a text waited for its batch", scheduler_stats["mean_wait_ms"]),
+        })
+        counters["pdfsum_encoder_batches"] = ("Scheduled encoder batches since start", scheduler_stats["batches"])
+    return metrics_registry.render(gauges, counters)
+
+def _validate_upload(file, summary_sentences):
+    """Reject bad uploads with a 400; returns the file size in bytes"""
     # Validate file
     if not file.filename.endswith('.pdf'):
         raise HTTPException(
@@ -95,21 +161,111 @@ async def upload_pdf(
             detail="File too large. Maximum size is 50MB."
         )
     
+    return file_size
+
+def _save_upload(file, path):
+    """Stream the upload to disk, hashing the bytes on the way; returns the SHA-256 hex digest"""
+    digest = hashlib.sha256()
+    with open(path, "wb") as buffer:
+        for block in iter(lambda: file.file.read(UPLOAD_BLOCK_SIZE), b""):
+            digest.update(block)
+            buffer.write(block)
+    return digest.hexdigest()
+
+def _validate_tier(tier, allowed=("fast", "full")):
+    if tier not in allowed:
+        raise HTTPException(
+            status_code=400,
+            detail=f"tier must be one of: {', '.join(allowed)}"
+        )
+
+def _cache_tier(tier):
+    # "both" ends with the full summary, so it shares the full tier's entries
+    return "fast" if tier == "fast" else "full"
+
+def _summary_response(result, summary_sentences, file_size):
+    """The cacheable part of a finished upload's response"""
+    # Validate output
+    if not result.get("summary") or len(result["summary"]) < 50:
+        raise ValueError("Generated summary is too short or empty")
+    
+    return {
+        "summary": result["summary"],
+        "tier": result["tier"],
+        "keyphrases": result["keyphrases"],
+        "stats": {
+            "num_sentences": result["num_sentences"],
+            "num_chunks": result["num_chunks"],
+            "summary_length": summary_sentences,
+            "file_size_kb": round(file_size / 1024, 2)
+        }
+    }
+
+def _error_detail(error_msg):
+    """Turn a pipeline exception message into a helpful one for the client"""
+    if "PDF" in error_msg or "extract" in error_msg.lower():
+        return "Failed to extract text from PDF. The file may be corrupted or image-based."
+    if "memory" in error_msg.lower() or "CUDA" in error_msg:
+        return "Insufficient memory to process this document. Try a smaller file."
+    return f"Processing error: {error_msg}"
+
+@app.post("/upload")
+async def upload_pdf(
+    file: UploadFile = File(...),
+    summary_sentences: int = 5,
+    include_metrics: bool = False,
+    tier: str = "full"
+):
+    """
+    Upload a PDF and receive an extractive summary
+    
+    Parameters:
+    - file: PDF document (max 50MB)
+    - summary_sentences: Number of sentences (3-10, default: 5)
+    - include_metrics: Add per-stage timings, work counters and the process's peak memory
+    - tier: "full" (default) or "fast", which skips embeddings and answers in about a second
+    
+    Returns:
+    - summary: Coherent extractive summary
+    - keyphrases: Key concepts from document
+    - stats: Processing statistics
+    - metrics: Only with include_metrics (null when served from cache)
+    """
+    
+    file_size = _validate_upload(file, summary_sentences)
+    _validate_tier(tier)
+    
     job_id = str(uuid.uuid4())
     path = os.path.join(UPLOAD_DIR, f"{job_id}.pdf")
     
     try:
-        # Save file
+        # Save file, hashing the bytes as they stream to disk
         print(f"Processing job {job_id}: {file.filename}")
-        with open(path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        file_hash = await run_in_threadpool(_save_upload, file, path)
         
-        # Process
-        result = process_pdf_and_summarize(path, summary_sentences=summary_sentences)
+        # Identical bytes with identical parameters: reuse the stored result
+        cached = result_cache.get(file_hash, summary_sentences, tier)
+        if cached is not None:
+            if os.path.exists(path):
+                os.remove(path)
+            print(f"✅ Job {job_id} served from result cache")
+            response = {
+                "job_id": job_id,
+                "filename": file.filename,
+                **cached,
+                "cached": True
+            }
+            if include_metrics:
+                response["metrics"] = None
+            return response
         
-        # Validate output
-        if not result.get("summary") or len(result["summary"]) < 50:
-            raise ValueError("Generated summary is too short or empty")
+        # Process on the bounded executor so the event loop stays free
+        result = await pipeline_executor.run(
+            process_pdf_and_summarize, path, summary_sentences=summary_sentences,
+            document_name=file.filename, tier=tier
+        )
+        
+        response = _summary_response(result, summary_sentences, file_size)
         
         # Clean up
         if os.path.exists(path):
@@ -117,18 +273,29 @@ async def upload_pdf(
         
         print(f"✅ Job {job_id} completed successfully")
         
-        return {
+        result_cache.set(file_hash, summary_sentences, response, tier)
+        
+        response = {
             "job_id": job_id,
             "filename": file.filename,
-            "summary": result["summary"],
-            "keyphrases": result["keyphrases"],
-            "stats": {
-                "num_sentences": result["num_sentences"],
-                "num_chunks": result["num_chunks"],
-                "summary_length": summary_sentences,
-                "file_size_kb": round(file_size / 1024, 2)
-            }
+            **response,
+            "revision": result["revision"],
+            "cached": False
         }
+        if include_metrics:
+            response["metrics"] = result["metrics"]
+        return response
+        
+    except ExecutorSaturated as e:
+        if os.path.exists(path):
+            os.remove(path)
+        
+        print(f"⏳ Job {job_id} rejected: pipeline at capacity")
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy summarizing other documents. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
         
     except Exception as e:
         # Clean up on error
@@ -142,14 +309,310 @@ async def upload_pdf(
         print(error_trace)
         
         # Return helpful error messages
-        if "PDF" in error_msg or "extract" in error_msg.lower():
-            detail = "Failed to extract text from PDF. The file may be corrupted or image-based."
-        elif "memory" in error_msg.lower() or "CUDA" in error_msg:
-            detail = "Insufficient memory to process this document. Try a smaller file."
-        else:
-            detail = f"Processing error: {error_msg}"
+        raise HTTPException(status_code=500, detail=_error_detail(error_msg))
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/upload/stream")
+async def upload_pdf_stream(
+    file: UploadFile = File(...),
+    summary_sentences: int = 5,
+    tier: str = "both"
+):
+    """
+    Upload a PDF and follow its summarization as Server-Sent Events
+    
+    tier: "both" (default) sends a fast heuristic summary as the
+    "fast_summary" stage event, typically within a second, then refines it
+    with embeddings. "fast" stops after the heuristic one, "full" skips it.
+    
+    Events, each with a JSON data line:
+    - stage: a pipeline stage finished, with its statistics (keyphrases
+      arrive here well before the summary)
+    - progress: partial progress of a running stage, {stage, done, total}
+    - result: the same body /upload returns; ends the stream
+    - error: {status_code, detail}; ends the stream
+    
+    Bad uploads and a saturated server are rejected with 400 / 503 before
+    the stream starts.
+    """
+    file_size = _validate_upload(file, summary_sentences)
+    _validate_tier(tier, SUMMARY_TIERS)
+    
+    job_id = str(uuid.uuid4())
+    path = os.path.join(UPLOAD_DIR, f"{job_id}.pdf")
+    print(f"Processing job {job_id} (stream): {file.filename}")
+    
+    def clean_up(_future=None):
+        if os.path.exists(path):
+            os.remove(path)
+    
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    
+    def progress(stage, info):
+        # Called on pipeline threads
+        event = "progress" if info.get("in_progress") else "stage"
+        data = {"stage": stage, **{k: v for k, v in info.items() if k != "in_progress"}}
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+    
+    # Until the pipeline owns the file, every way out removes it
+    try:
+        file_hash = await run_in_threadpool(_save_upload, file, path)
+        
+        cached = result_cache.get(file_hash, summary_sentences, _cache_tier(tier))
+        if cached is not None:
+            clean_up()
+            print(f"✅ Job {job_id} served from result cache")
+            
+            async def cached_events():
+                yield _sse("result", {"job_id": job_id, "filename": file.filename, **cached, "cached": True})
+            
+            return StreamingResponse(cached_events(), media_type="text/event-stream")
         
-        raise HTTPException(status_code=500, detail=detail)
+        future = pipeline_executor.submit(
+            process_pdf_and_summarize, path, summary_sentences=summary_sentences,
+            # Callbacks cannot cross into worker processes; that executor streams the result only
+            progress_callback=progress if pipeline_executor.kind == "thread" else None,
+            document_name=file.filename,
+            tier=tier
+        )
+    except ExecutorSaturated as e:
+        clean_up()
+        print(f"⏳ Job {job_id} rejected: pipeline at capacity")
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy summarizing other documents. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except BaseException:
+        clean_up()
+        raise
+    # The pipeline finishes even if the client goes away
+    future.add_done_callback(clean_up)
+    done = asyncio.wrap_future(future)
+    
+    async def stream():
+        yield _sse("stage", {"stage": "queued", "job_id": job_id, "stages": list(TIER_STAGES[tier])})
+        while True:
+            getter = asyncio.ensure_future(events.get())
+            finished, _ = await asyncio.wait({getter, done}, timeout=STREAM_KEEPALIVE,
+                                             return_when=asyncio.FIRST_COMPLETED)
+            if getter in finished:
+                yield _sse(*getter.result())
+                continue
+            getter.cancel()
+            if done not in finished:
+                yield ": keep-alive\n\n"
+                continue
+            break
+        
+        # Events queued before the pipeline returned
+        while not events.empty():
+            yield _sse(*events.get_nowait())
+        
+        try:
+            result = done.result()
+            response = _summary_response(result, summary_sentences, file_size)
+        except Exception as e:
+            print(f"❌ Error in job {job_id}: {e}")
+            print(traceback.format_exc())
+            yield _sse("error", {"status_code": 500, "detail": _error_detail(str(e))})
+            return
+        
+        result_cache.set(file_hash, summary_sentences, response, _cache_tier(tier))
+        print(f"✅ Job {job_id} completed successfully")
+        yield _sse("result", {
+            "job_id": job_id,
+            "filename": file.filename,
+            **response,
+            "revision": result["revision"],
+            "cached": False
+        })
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    summary_sentences: int = 5,
+    tier: str = "full"
+):
+    """
+    Queue a PDF for summarization and return immediately
+    
+    Poll GET /jobs/{job_id} for status, per-stage progress and the result.
+    tier is "full", "fast", or "both", where the fast summary shows up in
+    the progress of the "fast_summary" stage before the job finishes.
+    """
+    _validate_upload(file, summary_sentences)
+    _validate_tier(tier, SUMMARY_TIERS)
+    
+    job_id = str(uuid.uuid4())
+    path = os.path.join(UPLOAD_DIR, f"{job_id}.pdf")
+    
+    try:
+        await run_in_threadpool(_save_upload, file, path)
+        get_job_backend().enqueue(path, summary_sentences, job_id=job_id, tier=tier)
+    except Exception as e:
+        if os.path.exists(path):
+            os.remove(path)
+        print(f"❌ Failed to queue job {job_id}: {e}")
+        raise HTTPException(status_code=503, detail=f"Could not queue job: {e}")
+    
+    print(f"📥 Job {job_id} queued: {file.filename}")
+    return {
+        "job_id": job_id,
+        "filename": file.filename,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}"
+    }
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Job status (queued, started, finished, failed), per-stage progress and result"""
+    record = get_job_backend().status(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return record
+
+def _batch_directory(directory):
+    """Resolve a server-side directory, refusing anything outside BATCH_ROOT"""
+    if not BATCH_ROOT:
+        raise HTTPException(status_code=400, detail="Server-side directories are disabled (PDFSUM_BATCH_ROOT unset)")
+    root = os.path.realpath(BATCH_ROOT)
+    path = os.path.realpath(os.path.join(root, directory))
+    if os.path.commonpath([root, path]) != root or not os.path.isdir(path):
+        raise HTTPException(status_code=400, detail=f"Not a directory under the batch root: {directory}")
+    return path
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(UPLOAD_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class _StreamingResponseWithCleanup(StreamingResponse):
+    """StreamingResponse that calls cleanup() once it is done, however it ends"""
+    
+    def __init__(self, content, cleanup, **kwargs):
+        super().__init__(content, **kwargs)
+        self.cleanup = cleanup
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.cleanup()
+
+@app.post("/batch")
+async def batch_summarize(
+    files: Optional[List[UploadFile]] = File(None),
+    directory: Optional[str] = None,
+    summary_sentences: int = 5,
+    tier: str = "full"
+):
+    """
+    Summarize many PDFs in one request, streaming one JSON line per document
+    
+    Parameters:
+    - files: PDF documents (multipart, max 50MB each)
+    - directory: or a directory of PDFs, relative to the server's PDFSUM_BATCH_ROOT
+    - summary_sentences: Number of sentences (3-10, default: 5)
+    - tier: "full" (default) or "fast", which skips embeddings
+    
+    Each line has filename, status ("finished" or "failed"), and summary,
+    keyphrases and stats, or error. Documents seen before come first,
+    served from the result cache; the rest follow in input order.
+    """
+    if bool(files) == bool(directory):
+        raise HTTPException(status_code=400, detail="Send either files or directory")
+    _validate_tier(tier)
+    
+    documents = []  # (name, path, delete_after)
+    try:
+        if files:
+            for file in files:
+                _validate_upload(file, summary_sentences)
+            for file in files:
+                path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}.pdf")
+                documents.append((file.filename, path, True))
+                await run_in_threadpool(_save_upload, file, path)
+        else:
+            if not 3 <= summary_sentences <= 10:
+                raise HTTPException(status_code=400, detail="summary_sentences must be between 3 and 10")
+            root = _batch_directory(directory)
+            documents = [(os.path.relpath(path, root), path, False) for path in list_pdfs(root)]
+    except BaseException:
+        for _, path, delete_after in documents:
+            if delete_after and os.path.exists(path):
+                os.remove(path)
+        raise
+    
+    if not batch_slots.acquire(blocking=False):
+        for _, path, delete_after in documents:
+            if delete_after and os.path.exists(path):
+                os.remove(path)
+        raise HTTPException(
+            status_code=503,
+            detail="Another batch is running. Please retry later.",
+            headers={"Retry-After": str(pipeline_executor.retry_after)}
+        )
+    
+    print(f"📦 Batch of {len(documents)} documents")
+    finished = threading.Lock()
+    
+    def finish():
+        # Called by the stream and by the response; only the first call counts
+        if not finished.acquire(blocking=False):
+            return
+        batch_slots.release()
+        for _, path, delete_after in documents:
+            if delete_after and os.path.exists(path):
+                os.remove(path)
+        print(f"✅ Batch of {len(documents)} documents done")
+    
+    def stream():
+        try:
+            hashes = []
+            pending = []
+            for name, path, _ in documents:
+                file_hash = _file_sha256(path)
+                cached = result_cache.get(file_hash, summary_sentences, tier)
+                if cached is None:
+                    hashes.append(file_hash)
+                    pending.append((name, path))
+                else:
+                    yield json.dumps({"filename": name, "status": "finished", **cached, "cached": True}) + "\n"
+            
+            # Results come back in input order, one per document
+            results = iter_batch_summaries(pending, summary_sentences=summary_sentences, tier=tier)
+            for (_, path), file_hash, result in zip(pending, hashes, results):
+                if result["status"] == "finished":
+                    # Cache the same body /upload would have, so either endpoint can serve it
+                    try:
+                        response = _summary_response({
+                            **result,
+                            "num_sentences": result["stats"]["num_sentences"],
+                            "num_chunks": result["stats"]["num_chunks"]
+                        }, summary_sentences, os.path.getsize(path))
+                    except ValueError as e:
+                        print(f"⚠️ Not caching {result['filename']}: {e}")
+                    else:
+                        result_cache.set(file_hash, summary_sentences, response, tier)
+                    result["cached"] = False
+                yield json.dumps(result) + "\n"
+        finally:
+            finish()
+    
+    # A client that disconnects before the first line never starts stream()
+    return _StreamingResponseWithCleanup(stream(), finish, media_type="application/x-ndjson")
 
 if __name__ == "__main__":
     import uvicorn
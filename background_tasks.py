@@ -1,9 +1,252 @@
-from rq import Queue
-from redis import Redis
-from models.summarizer import process_pdf_and_summarize
+"""
+Background summarization jobs.
 
-redis_conn = Redis()
-q = Queue(connection=redis_conn)
+Two backends share the same interface (enqueue / status):
+- "rq": jobs go to a Redis queue and run in separate worker processes
+  (start one with `python background_tasks.py`). Pass a fakeredis
+  connection to run it without a Redis server.
+- "inprocess": jobs run on a thread pool inside the API process, with no
+  external services.
 
-def enqueue_job(file_path):
-    q.enqueue(process_pdf_and_summarize, file_path)
\ No newline at end of file
+The upload directory must be visible to the workers (same host or a
+shared volume).
+"""
+import copy
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from inference import process_pdf_and_summarize, TIER_STAGES
+
+JOB_BACKEND = os.environ.get("JOB_BACKEND", "inprocess")  # "inprocess" or "rq"
+JOB_QUEUE_NAME = os.environ.get("JOB_QUEUE_NAME", "summaries")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 1))
+JOB_TIMEOUT = int(os.environ.get("JOB_TIMEOUT", 1800))
+JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", 3600))
+MAX_TRACKED_JOBS = 1000
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+
+def run_summarization_job(pdf_path, summary_sentences=5, progress_callback=None, tier="full"):
+    """Job body shared by every backend; always removes the uploaded file"""
+    try:
+        file_size = os.path.getsize(pdf_path)
+        result = process_pdf_and_summarize(
+            pdf_path,
+            summary_sentences=summary_sentences,
+            progress_callback=progress_callback,
+            tier=tier
+        )
+        return {
+            "summary": result["summary"],
+            "tier": result["tier"],
+            "fast_summary": result["fast_summary"],
+            "keyphrases": result["keyphrases"],
+            "stats": {
+                "num_sentences": result["num_sentences"],
+                "num_chunks": result["num_chunks"],
+                "summary_length": summary_sentences,
+                "file_size_kb": round(file_size / 1024, 2)
+            }
+        }
+    finally:
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+
+
+def _empty_progress(tier="full"):
+    return {
+        "current_stage": None,
+        "completed_stages": 0,
+        "total_stages": len(TIER_STAGES[tier]),
+        "stages": {}
+    }
+
+
+def _record_stage(progress, stage, info):
+    if info.get("in_progress"):
+        # Partial progress of a stage still running
+        progress["stage_progress"] = {"stage": stage, "done": info["done"], "total": info["total"]}
+        return
+    if progress.get("stage_progress", {}).get("stage") == stage:
+        del progress["stage_progress"]
+    progress["current_stage"] = stage
+    progress["completed_stages"] = len(progress["stages"]) + 1
+    progress["stages"][stage] = {**info, "finished_at": time.time()}
+
+
+# --- RQ backend -------------------------------------------------------------
+
+def _rq_summarization_job(pdf_path, summary_sentences=5, tier="full"):
+    """Entry point executed by RQ workers; publishes progress through job.meta"""
+    from rq import get_current_job
+
+    job = get_current_job()
+    progress = _empty_progress(tier)
+
+    def report(stage, info):
+        _record_stage(progress, stage, info)
+        if job is not None:
+            job.meta["progress"] = progress
+            job.save_meta()
+
+    return run_summarization_job(pdf_path, summary_sentences, progress_callback=report, tier=tier)
+
+
+class RQJobBackend:
+    """Jobs on an RQ queue; status is read back from Redis"""
+
+    def __init__(self, connection=None, queue_name=JOB_QUEUE_NAME, is_async=True):
+        from rq import Queue
+
+        if connection is None:
+            from redis import Redis
+            connection = Redis.from_url(REDIS_URL)
+        self.connection = connection
+        self.queue = Queue(queue_name, connection=connection, is_async=is_async)
+
+    def enqueue(self, pdf_path, summary_sentences=5, job_id=None, tier="full"):
+        job = self.queue.enqueue(
+            _rq_summarization_job,
+            pdf_path,
+            summary_sentences,
+            tier,
+            job_id=job_id or str(uuid.uuid4()),
+            meta={"progress": _empty_progress(tier)},
+            job_timeout=JOB_TIMEOUT,
+            result_ttl=JOB_RESULT_TTL,
+            failure_ttl=JOB_RESULT_TTL
+        )
+        return job.id
+
+    def status(self, job_id):
+        from rq.job import Job
+        from rq.exceptions import NoSuchJobError
+
+        try:
+            job = Job.fetch(job_id, connection=self.connection)
+        except NoSuchJobError:
+            return None
+
+        status = job.get_status()
+        status = getattr(status, "value", status)
+        record = {
+            "job_id": job.id,
+            "status": status,
+            "progress": job.meta.get("progress", _empty_progress()),
+            "result": None,
+            "error": None
+        }
+        if status == "finished":
+            record["result"] = job.return_value()
+        elif status == "failed":
+            latest = job.latest_result()
+            record["error"] = latest.exc_string if latest is not None else "Job failed"
+        return record
+
+
+# --- In-process backend -----------------------------------------------------
+
+class InProcessJobBackend:
+    """Jobs on a local thread pool; status lives in a bounded dict"""
+
+    def __init__(self, max_workers=JOB_WORKERS, max_tracked=MAX_TRACKED_JOBS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summary-job")
+        self.max_tracked = max_tracked
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def enqueue(self, pdf_path, summary_sentences=5, job_id=None, tier="full"):
+        job_id = job_id or str(uuid.uuid4())
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "progress": _empty_progress(tier),
+                "result": None,
+                "error": None
+            }
+            self._evict()
+        self.executor.submit(self._run, job_id, pdf_path, summary_sentences, tier)
+        return job_id
+
+    def _evict(self):
+        # Forget the oldest finished jobs once too many are tracked
+        for old_id in list(self._jobs):
+            if len(self._jobs) <= self.max_tracked:
+                break
+            if self._jobs[old_id]["status"] in ("finished", "failed"):
+                del self._jobs[old_id]
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _run(self, job_id, pdf_path, summary_sentences, tier="full"):
+        self._update(job_id, status="started")
+
+        def report(stage, info):
+            with self._lock:
+                if job_id in self._jobs:
+                    _record_stage(self._jobs[job_id]["progress"], stage, info)
+
+        try:
+            result = run_summarization_job(pdf_path, summary_sentences, progress_callback=report, tier=tier)
+            self._update(job_id, status="finished", result=result)
+        except Exception as e:
+            print(f"❌ Error in job {job_id}: {e}")
+            print(traceback.format_exc())
+            self._update(job_id, status="failed", error=str(e))
+
+    def status(self, job_id):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return None
+            # _record_stage keeps mutating the nested dicts on the pipeline thread
+            return {**record, "progress": copy.deepcopy(record["progress"])}
+
+
+def make_job_backend(backend=JOB_BACKEND, **kwargs):
+    """Build the job backend for the configured name"""
+    if backend == "rq":
+        return RQJobBackend(**kwargs)
+    if backend == "inprocess":
+        return InProcessJobBackend(**kwargs)
+    raise ValueError(f"Unknown job backend: {backend}")
+
+
+_job_backend = None
+_job_backend_lock = threading.Lock()
+
+def get_job_backend():
+    """Process-wide job backend, created on first use"""
+    global _job_backend
+    with _job_backend_lock:
+        if _job_backend is None:
+            _job_backend = make_job_backend()
+        return _job_backend
+
+
+def enqueue_job(file_path, summary_sentences=5, tier="full"):
+    return get_job_backend().enqueue(file_path, summary_sentences, tier=tier)
+
+
+if __name__ == "__main__":
+    # Standalone RQ worker: python background_tasks.py
+    from redis import Redis
+    from rq import Queue, SimpleWorker
+
+    from models.registry import warm_up
+
+    # Jobs run in this process, which loads the models once. The default
+    # Worker forks a work horse per job, and CUDA and torch thread pools do
+    # not survive a fork.
+    print(f"🔥 Warming up models: {warm_up()}")
+    connection = Redis.from_url(REDIS_URL)
+    print(f"🚀 Starting summarization worker on queue '{JOB_QUEUE_NAME}' ({REDIS_URL})")
+    SimpleWorker([Queue(JOB_QUEUE_NAME, connection=connection)], connection=connection).work()
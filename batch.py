@@ -0,0 +1,171 @@
+"""
+Summarize many PDFs in one go, for throughput rather than latency.
+
+Documents move through two stages:
+- prepare (extraction, keyphrases, chunking) runs on a prefetch thread,
+  BATCH_PREFETCH documents ahead of the encoder
+- the main thread packs prepared documents until they hold at least
+  BATCH_PACK_CHUNKS chunks, encodes the whole pack in shared encoder
+  batches, then scores and selects per document
+
+So document N+1 is extracted while document N is being embedded, and
+short documents fill each other's encoder batches. Results come out per
+document as soon as its pack is done, in input order.
+
+The "fast" tier skips the encoder: each document is scored on the
+heuristics alone and summarized as soon as it is prepared.
+"""
+import os
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from inference import MAX_DOCUMENT_CHARS
+from models.pdf_to_text import pdf_to_text_streaming
+from models.keyphrase_extraction import extract_keyphrases
+from models.keyphrase_matcher import KeyphraseMatcher
+from models.chunking import smart_chunk_by_sentences
+from models.embeddings import apply_keyphrase_weights, get_documents_chunk_and_sentence_embeddings
+from models.sentence_scoring import compute_comprehensive_scores
+from models.mmr_selection import mmr_select_sentences
+
+BATCH_PREFETCH = int(os.environ.get("BATCH_PREFETCH", 4))
+BATCH_PACK_CHUNKS = int(os.environ.get("BATCH_PACK_CHUNKS", 128))
+
+
+def list_pdfs(directory):
+    """PDF files directly inside directory, sorted by name"""
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(".pdf") and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+def prepare_document(pdf_path):
+    """Everything before the encoder: text, keyphrases, chunks"""
+    start = time.perf_counter()
+    text = pdf_to_text_streaming(pdf_path, max_chars=MAX_DOCUMENT_CHARS)
+    keyphrases = extract_keyphrases(text, top_n=25)
+    chunks, sentences = smart_chunk_by_sentences(text, max_tokens=384, overlap_sentences=2)
+    return {
+        "text": text,
+        "keyphrases": keyphrases,
+        "chunks": chunks,
+        "sentences": sentences,
+        "prepare_s": time.perf_counter() - start
+    }
+
+
+def _finish_document(name, prepared, embedded, summary_sentences):
+    """Scoring and MMR for one document of an encoded pack, or heuristics only when embedded is None"""
+    start = time.perf_counter()
+    chunk_embeddings, sentence_embeddings = embedded if embedded is not None else (None, None)
+    matcher = KeyphraseMatcher(prepared["keyphrases"])
+    if chunk_embeddings is not None:
+        chunk_embeddings = apply_keyphrase_weights(chunk_embeddings, prepared["chunks"], matcher)
+    scores = compute_comprehensive_scores(
+        prepared["sentences"], chunk_embeddings, prepared["chunks"], matcher, prepared["text"]
+    )
+    selected = mmr_select_sentences(
+        prepared["sentences"], scores, sentence_embeddings, top_k=summary_sentences, lambda_param=0.7
+    )
+    return {
+        "filename": name,
+        "status": "finished",
+        "summary": " ".join(selected),
+        "tier": "full" if embedded is not None else "fast",
+        "keyphrases": prepared["keyphrases"][:15],
+        "stats": {
+            "num_sentences": len(prepared["sentences"]),
+            "num_chunks": len(prepared["chunks"]),
+            "summary_length": summary_sentences
+        },
+        "timings": {
+            "prepare_s": round(prepared["prepare_s"], 4),
+            "finish_s": round(time.perf_counter() - start, 4)
+        }
+    }
+
+
+def _failed(name, error):
+    print(f"❌ Batch document {name} failed: {error}")
+    traceback.print_exc()
+    return {"filename": name, "status": "failed", "error": str(error)}
+
+
+def _summarize_pack(pack, summary_sentences):
+    start = time.perf_counter()
+    try:
+        embedded = get_documents_chunk_and_sentence_embeddings(
+            [(prepared["chunks"], prepared["sentences"]) for _, prepared in pack]
+        )
+    except Exception as e:
+        for name, _ in pack:
+            yield _failed(name, e)
+        return
+    embedding_s = time.perf_counter() - start
+    print(f"   Encoded pack of {len(pack)} documents ({sum(len(p['chunks']) for _, p in pack)} chunks) "
+          f"in {embedding_s:.2f}s")
+
+    for (name, prepared), document_embeddings in zip(pack, embedded):
+        try:
+            result = _finish_document(name, prepared, document_embeddings, summary_sentences)
+        except Exception as e:
+            yield _failed(name, e)
+            continue
+        result["timings"]["pack_embedding_s"] = round(embedding_s, 4)
+        result["timings"]["pack_documents"] = len(pack)
+        yield result
+
+
+def iter_batch_summaries(documents, summary_sentences=5, prefetch=BATCH_PREFETCH, pack_chunks=BATCH_PACK_CHUNKS,
+                         tier="full"):
+    """
+    Summarize (name, pdf_path) pairs, yielding one result dict per document
+    in input order. A document that fails yields status "failed" with the
+    error instead of stopping the batch. tier is "full" or "fast".
+    """
+    if tier not in ("fast", "full"):
+        raise ValueError(f"Unknown tier: {tier}")
+    documents = iter(documents)
+    pending = deque()
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-prefetch")
+
+    def top_up():
+        while len(pending) < max(prefetch, 1):
+            item = next(documents, None)
+            if item is None:
+                return
+            name, path = item
+            pending.append((name, pool.submit(prepare_document, path)))
+
+    try:
+        top_up()
+        while pending:
+            pack = []
+            pack_size = 0
+            while pending and pack_size < pack_chunks:
+                name, future = pending.popleft()
+                top_up()
+                try:
+                    prepared = future.result()
+                except Exception as e:
+                    if pack:
+                        # Keep results in input order
+                        yield from _summarize_pack(pack, summary_sentences)
+                        pack, pack_size = [], 0
+                    yield _failed(name, e)
+                    continue
+                if tier == "fast":
+                    try:
+                        yield _finish_document(name, prepared, None, summary_sentences)
+                    except Exception as e:
+                        yield _failed(name, e)
+                    continue
+                pack.append((name, prepared))
+                pack_size += len(prepared["chunks"])
+            if pack:
+                yield from _summarize_pack(pack, summary_sentences)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
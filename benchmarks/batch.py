@@ -0,0 +1,77 @@
+"""
+Batch throughput benchmark: summarizes the same synthetic PDFs one by one
+with process_pdf_and_summarize, then through batch.iter_batch_summaries
+(prefetched extraction, packed encoder batches), and reports
+documents/hour for both. The embedding cache is cleared before each run.
+Summaries must be identical, so the run fails if any differ.
+
+    python -m benchmarks.batch --documents 24 --pages 3 --output batch.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from batch import iter_batch_summaries, BATCH_PACK_CHUNKS, BATCH_PREFETCH
+from benchmarks.pdfs import make_synthetic_pdf
+from inference import process_pdf_and_summarize
+from models import registry
+from models.embedding_cache import embedding_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=24)
+    parser.add_argument("--pages", type=int, default=3, help="Pages per document")
+    parser.add_argument("--pack-chunks", type=int, default=BATCH_PACK_CHUNKS)
+    parser.add_argument("--prefetch", type=int, default=BATCH_PREFETCH)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    registry.warm_up()
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [
+            make_synthetic_pdf(os.path.join(tmp, f"doc-{i}.pdf"), args.pages, seed=i)
+            for i in range(args.documents)
+        ]
+
+        embedding_cache.clear()
+        start = time.perf_counter()
+        sequential = [process_pdf_and_summarize(path)["summary"] for path in paths]
+        sequential_s = time.perf_counter() - start
+
+        embedding_cache.clear()
+        start = time.perf_counter()
+        batched = [
+            result.get("summary")
+            for result in iter_batch_summaries(
+                [(os.path.basename(path), path) for path in paths],
+                prefetch=args.prefetch,
+                pack_chunks=args.pack_chunks
+            )
+        ]
+        batch_s = time.perf_counter() - start
+
+    report = {
+        "benchmark": "batch",
+        "documents": args.documents,
+        "pages": args.pages,
+        "pack_chunks": args.pack_chunks,
+        "prefetch": args.prefetch,
+        "sequential_s": round(sequential_s, 3),
+        "batch_s": round(batch_s, 3),
+        "sequential_docs_per_hour": round(args.documents / sequential_s * 3600),
+        "batch_docs_per_hour": round(args.documents / batch_s * 3600),
+        "speedup": round(sequential_s / batch_s, 2)
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    mismatches = [i for i, (a, b) in enumerate(zip(sequential, batched)) if a != b]
+    assert not mismatches, f"batch summaries differ for documents {mismatches}"
+
+
+if __name__ == "__main__":
+    main()
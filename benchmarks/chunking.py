@@ -0,0 +1,120 @@
+"""
+Chunker benchmark and regression check: runs smart_chunk_by_sentences
+against the previous per-sentence implementation, asserts identical
+chunks and reports the speed-up.
+
+    python -m benchmarks.chunking --sentences 2000 --output chunking.json
+"""
+import argparse
+import json
+import time
+import nltk
+from benchmarks.corpus import synthetic_document
+from models.chunking import smart_chunk_by_sentences
+from models.registry import get_embedding_tokenizer, ensure_nltk_data
+
+
+def reference_chunk_by_sentences(text, max_tokens=384, overlap_sentences=2):
+    """The original chunker, kept verbatim as the equivalence oracle"""
+    tokenizer = get_embedding_tokenizer()
+    sentences = nltk.sent_tokenize(text)
+
+    chunks = []
+    current_chunk = []
+    current_tokens = 0
+
+    for i, sent in enumerate(sentences):
+        sent_tokens = tokenizer.encode(sent, add_special_tokens=False)
+        sent_token_count = len(sent_tokens)
+
+        if sent_token_count > max_tokens:
+            if current_chunk:
+                chunks.append({
+                    'text': ' '.join(current_chunk),
+                    'sentence_indices': list(range(i - len(current_chunk), i))
+                })
+                current_chunk = []
+                current_tokens = 0
+
+            words = sent.split()
+            temp_chunk = []
+            temp_tokens = 0
+
+            for word in words:
+                word_tokens = len(tokenizer.encode(word, add_special_tokens=False))
+                if temp_tokens + word_tokens > max_tokens:
+                    if temp_chunk:
+                        chunks.append({'text': ' '.join(temp_chunk), 'sentence_indices': [i]})
+                    temp_chunk = [word]
+                    temp_tokens = word_tokens
+                else:
+                    temp_chunk.append(word)
+                    temp_tokens += word_tokens
+
+            if temp_chunk:
+                chunks.append({'text': ' '.join(temp_chunk), 'sentence_indices': [i]})
+            continue
+
+        if current_tokens + sent_token_count > max_tokens:
+            if current_chunk:
+                chunks.append({
+                    'text': ' '.join(current_chunk),
+                    'sentence_indices': list(range(i - len(current_chunk), i))
+                })
+
+            overlap_start = max(0, len(current_chunk) - overlap_sentences)
+            current_chunk = current_chunk[overlap_start:] + [sent]
+            current_tokens = sum(len(tokenizer.encode(s, add_special_tokens=False))
+                                 for s in current_chunk)
+        else:
+            current_chunk.append(sent)
+            current_tokens += sent_token_count
+
+    if current_chunk:
+        chunks.append({
+            'text': ' '.join(current_chunk),
+            'sentence_indices': list(range(len(sentences) - len(current_chunk), len(sentences)))
+        })
+
+    return chunks, sentences
+
+
+def _time(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--oversized-every", type=int, default=150)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    ensure_nltk_data()
+    get_embedding_tokenizer()
+    text = synthetic_document(args.sentences, oversized_every=args.oversized_every)
+
+    report = {"benchmark": "chunking", "sentences": args.sentences, "cases": []}
+    for max_tokens, overlap in [(384, 2), (128, 2), (384, 0), (64, 3)]:
+        expected, reference_s = _time(reference_chunk_by_sentences, text, max_tokens, overlap)
+        actual, current_s = _time(smart_chunk_by_sentences, text, max_tokens, overlap)
+        assert actual == expected, f"chunk mismatch at max_tokens={max_tokens}, overlap={overlap}"
+        report["cases"].append({
+            "max_tokens": max_tokens,
+            "overlap_sentences": overlap,
+            "chunks": len(actual[0]),
+            "reference_s": round(reference_s, 4),
+            "current_s": round(current_s, 4),
+            "speedup": round(reference_s / current_s, 2) if current_s else None
+        })
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
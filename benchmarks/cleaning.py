@@ -0,0 +1,105 @@
+"""
+Text cleaning micro-benchmark: throughput in MB/s of clean_extracted_text
+and of the per-page line mode against the original implementation, over
+a synthetic corpus plus any PDFs given on the command line. Asserts the
+output is unchanged.
+
+    python -m benchmarks.cleaning --pages 300 paper1.pdf paper2.pdf
+"""
+import argparse
+import json
+import re
+import time
+from collections import Counter
+from benchmarks.corpus import synthetic_page_text
+from models.pdf_to_text import clean_extracted_text, iter_raw_pages, _clean_page_lines
+
+
+def reference_clean_extracted_text(text):
+    """The original cleaner, kept verbatim as the equivalence oracle"""
+    text = re.sub(r'(\w+)-\s*\n\s*(\w+)', r'\1\2', text)
+    text = re.sub(r'\S+@\S+\.\S+', '', text)
+    text = re.sub(r'http[s]?://\S+|www\.\S+', '', text)
+    text = re.sub(r'doi:\s*\S+', '', text, flags=re.I)
+    text = re.sub(r'\n\s*\d+\s*\n', '\n', text)
+    text = re.sub(r'\b(page|p\.)\s*\d+\b', '', text, flags=re.I)
+    text = re.sub(r'[©®™].*?\n', '', text)
+    text = re.sub(r'\n\s*(Figure|Table|Fig\.)\s+\d+[:\.].*?\n', '\n', text, flags=re.I)
+    text = re.sub(r'\d+\s*(Department|University|Institute|College).*?\n', '', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r'[^\x00-\x7F\n]+', '', text)
+
+    lines = text.split('\n')
+    line_counts = Counter(lines)
+
+    cleaned_lines = []
+    for line in lines:
+        line = line.strip()
+        if len(line) < 5:
+            continue
+        if line_counts[line] > 3:
+            continue
+        cleaned_lines.append(line)
+
+    full_text = ' '.join(cleaned_lines)
+    full_text = re.sub(r'\s+', ' ', full_text).strip()
+    return full_text
+
+
+def _throughput(fn, documents, repeats):
+    total_bytes = sum(len(doc.encode("utf-8")) for doc in documents)
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for doc in documents:
+            fn(doc)
+        best = min(best, time.perf_counter() - start)
+    return total_bytes / 2**20 / best, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("pdfs", nargs="*", help="Extra PDFs to include in the corpus")
+    parser.add_argument("--pages", type=int, default=300, help="Synthetic pages per document")
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    paged_corpus = [
+        [synthetic_page_text(page, seed=doc) for page in range(args.pages)]
+        for doc in range(args.documents)
+    ]
+    paged_corpus += [list(iter_raw_pages(path)) for path in args.pdfs]
+    corpus = ["\n".join(page for page in pages if page) for pages in paged_corpus]
+
+    for doc in corpus:
+        assert clean_extracted_text(doc) == reference_clean_extracted_text(doc), "cleaning output changed"
+
+    reference_mbs, reference_s = _throughput(reference_clean_extracted_text, corpus, args.repeats)
+    current_mbs, current_s = _throughput(clean_extracted_text, corpus, args.repeats)
+    pages = [page for pages in paged_corpus for page in pages]
+    page_mode_mbs, page_mode_s = _throughput(_clean_page_lines, pages, args.repeats)
+
+    report = {
+        "benchmark": "cleaning",
+        "documents": len(corpus),
+        "corpus_mb": round(sum(len(d.encode("utf-8")) for d in corpus) / 2**20, 2),
+        "reference_mb_s": round(reference_mbs, 2),
+        "current_mb_s": round(current_mbs, 2),
+        "page_mode_mb_s": round(page_mode_mbs, 2),
+        "speedup": round(current_mbs / reference_mbs, 2),
+        "reference_s": round(reference_s, 4),
+        "current_s": round(current_s, 4),
+        "page_mode_s": round(page_mode_s, 4)
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Deterministic synthetic academic text for the benchmarks"""
+import random
+
+VOCABULARY = (
+    "model method approach framework results show data paper propose network neural "
+    "learning training performance task baseline evaluation dataset accuracy attention "
+    "transformer representation embedding retrieval summarization extractive sentence "
+    "document corpus benchmark improve achieve demonstrate significant experiments analysis "
+    "graph optimization gradient loss objective convergence robust efficient scalable"
+).split()
+FILLER = "the a of and to in is for that with on as by this we are an our which from".split()
+
+
+def _sentence(rng, min_words=6, max_words=32):
+    words = [
+        rng.choice(VOCABULARY) if rng.random() < 0.55 else rng.choice(FILLER)
+        for _ in range(rng.randint(min_words, max_words))
+    ]
+    sentence = " ".join(words).capitalize()
+    roll = rng.random()
+    if roll < 0.08:
+        sentence += f" [{rng.randint(1, 60)}]"
+    elif roll < 0.14:
+        sentence += f" (Smith et al., {rng.randint(1990, 2025)})"
+    return sentence + "."
+
+
+def synthetic_sentences(n_sentences, seed=0, oversized_every=0):
+    """Sentences of academic-looking prose; every Nth one is oversized if requested"""
+    rng = random.Random(seed)
+    sentences = []
+    for i in range(n_sentences):
+        if oversized_every and i % oversized_every == oversized_every - 1:
+            sentences.append(_sentence(rng, 400, 700))
+        else:
+            sentences.append(_sentence(rng))
+    return sentences
+
+
+def synthetic_document(n_sentences, seed=0, oversized_every=0):
+    return " ".join(synthetic_sentences(n_sentences, seed, oversized_every))
+
+
+def synthetic_page_text(page_number, seed=0, sentences_per_page=40):
+    """
+    Raw text the way PyMuPDF returns a page: hard line breaks, hyphenated
+    line ends, a running header, a page number, the odd URL and email.
+    """
+    rng = random.Random(seed * 100003 + page_number)
+    lines = ["Journal of Synthetic Research, Vol. 12", ""]
+    line = []
+    for sentence in synthetic_sentences(sentences_per_page, seed=rng.randint(0, 10**9)):
+        for word in sentence.split():
+            line.append(word)
+            if len(" ".join(line)) > 70:
+                if rng.random() < 0.1 and len(word) > 6:
+                    # Hyphenate the last word across the line break
+                    line[-1] = word[:4] + "-"
+                    lines.append(" ".join(line))
+                    line = [word[4:]]
+                else:
+                    lines.append(" ".join(line))
+                    line = []
+    if line:
+        lines.append(" ".join(line))
+
+    if rng.random() < 0.3:
+        lines.insert(rng.randint(2, len(lines)), "Contact: author@example.edu, see https://example.org/paper")
+    if rng.random() < 0.2:
+        lines.insert(rng.randint(2, len(lines)), f"Figure {rng.randint(1, 9)}: Results on the benchmark.")
+    lines.extend(["", str(page_number + 1), ""])
+    return "\n".join(lines)
@@ -0,0 +1,120 @@
+"""
+Encoder backend parity and speed check: encodes the same synthetic
+sentences and chunks with every backend in models.encoder_backends and
+compares them with eager fp32 torch. Drift is measured as the cosine
+similarity of the [CLS] vectors the pipeline uses. The run fails if any
+backend's minimum cosine falls below --min-cosine.
+
+    python -m benchmarks.encoders --backends torch-int8 onnx --threads 4
+"""
+import argparse
+import json
+import time
+import numpy as np
+import torch
+from benchmarks.corpus import synthetic_sentences
+from models import encoder_backends
+from models.registry import (
+    get_embedding_tokenizer, get_device, get_model, stage_model, from_pretrained
+)
+
+
+def _cls_vectors(encoder, tokenizer, texts, batch_size, max_length):
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        inputs = tokenizer(
+            texts[start:start + batch_size],
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=max_length
+        ).to(encoder.device)
+        with torch.no_grad():
+            vectors.append(encoder(inputs)[:, 0, :].float().cpu().numpy())
+    return np.concatenate(vectors)
+
+
+def _cosines(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", nargs="+", default=["torch-int8", "onnx"],
+                        choices=[b for b in encoder_backends.ENCODER_BACKENDS if b != "torch"])
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-length", type=int, default=512)
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads, 0 = library default")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    encoder_backends.apply_thread_limit(args.threads)
+    name = stage_model("embeddings")
+    tokenizer = get_embedding_tokenizer()
+
+    # Short sentences and long chunk-sized texts, as the pipeline encodes both
+    sentences = synthetic_sentences(args.texts, seed=7)
+    chunks = [" ".join(sentences[i:i + 12]) for i in range(0, len(sentences), 6)]
+    texts = sentences + chunks
+
+    def load_cpu_model():
+        from transformers import AutoModel
+        return from_pretrained(AutoModel, name).eval()
+
+    def load_config():
+        from transformers import AutoConfig
+        return from_pretrained(AutoConfig, name)
+
+    def run(encoder):
+        _cls_vectors(encoder, tokenizer, texts[:args.batch_size], args.batch_size, args.max_length)  # warm-up
+        start = time.perf_counter()
+        vectors = _cls_vectors(encoder, tokenizer, texts, args.batch_size, args.max_length)
+        return vectors, time.perf_counter() - start
+
+    reference = encoder_backends.TorchEncoder(get_model(name), get_device())
+    reference_vectors, reference_s = run(reference)
+
+    report = {
+        "benchmark": "encoders",
+        "model": name,
+        "texts": len(texts),
+        "threads": torch.get_num_threads(),
+        "torch_s": round(reference_s, 3),
+        "backends": []
+    }
+    failures = []
+    for backend in args.backends:
+        encoder = encoder_backends.load_encoder(
+            backend, name, tokenizer, get_device(),
+            load_model=lambda: get_model(name), load_cpu_model=load_cpu_model, load_config=load_config
+        )
+        if isinstance(encoder, encoder_backends.OnnxEncoder) and args.threads > 0:
+            encoder = encoder_backends.OnnxEncoder(
+                encoder_backends.onnx_path(name), encoder.hidden_size, threads=args.threads
+            )
+        vectors, seconds = run(encoder)
+        cosines = _cosines(vectors, reference_vectors)
+        report["backends"].append({
+            "backend": backend,
+            "seconds": round(seconds, 3),
+            "speedup": round(reference_s / seconds, 2),
+            "texts_per_s": round(len(texts) / seconds, 1),
+            "min_cosine": round(float(cosines.min()), 5),
+            "mean_cosine": round(float(cosines.mean()), 5)
+        })
+        if cosines.min() < args.min_cosine:
+            failures.append(f"{backend}: min cosine {cosines.min():.5f} < {args.min_cosine}")
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    assert not failures, "; ".join(failures)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Keyphrase benchmark: latency of the "fast" (prefiltered candidates) and
+"full" keyphrase modes on the same documents, and how many of the full
+mode's keyphrases the fast mode also returns. The embedding cache is
+cleared before every timed run, so leave EMBEDDING_CACHE_PATH unset.
+
+A repeat of the fast run on the warm cache must encode nothing: the
+document embedding and the candidates are all cache hits. The run fails
+otherwise.
+
+    python -m benchmarks.keyphrases --sentences 3000 paper.pdf
+"""
+import argparse
+import json
+import time
+from benchmarks.corpus import synthetic_document
+from inference import MAX_DOCUMENT_CHARS
+from models import instrumentation
+from models.embedding_cache import embedding_cache
+from models.keyphrase_extraction import extract_keyphrases, rank_candidates, KEYPHRASE_MAX_CANDIDATES
+from models.pdf_to_text import pdf_to_text_streaming
+from models.registry import get_keybert
+
+
+def _run(text, mode, top_n):
+    embedding_cache.clear()
+    start = time.perf_counter()
+    keyphrases = extract_keyphrases(text, top_n=top_n, mode=mode)
+    return keyphrases, time.perf_counter() - start
+
+
+def _warm_repeat(text, mode, top_n):
+    """Texts encoded when the same extraction runs again on the warm cache"""
+    with instrumentation.pipeline_run() as run:
+        keyphrases = extract_keyphrases(text, top_n=top_n, mode=mode)
+    return keyphrases, run.counters["encoded_texts"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("pdfs", nargs="*", help="PDFs to benchmark in addition to the synthetic document")
+    parser.add_argument("--sentences", type=int, default=3000, help="Sentences in the synthetic document")
+    parser.add_argument("--top-n", type=int, default=25)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    get_keybert()
+    documents = [("synthetic", synthetic_document(args.sentences)[:MAX_DOCUMENT_CHARS])]
+    documents += [(path, pdf_to_text_streaming(path, max_chars=MAX_DOCUMENT_CHARS)) for path in args.pdfs]
+
+    report = {"benchmark": "keyphrases", "max_candidates": KEYPHRASE_MAX_CANDIDATES, "documents": []}
+    failures = []
+    for name, text in documents:
+        full, full_s = _run(text, "full", args.top_n)
+        fast, fast_s = _run(text, "fast", args.top_n)
+        repeat, repeat_encoded = _warm_repeat(text, "fast", args.top_n)
+        if repeat_encoded or repeat != fast:
+            failures.append(f"{name}: warm repeat encoded {repeat_encoded} texts")
+        shared = set(fast) & set(full)
+        report["documents"].append({
+            "document": name,
+            "chars": len(text),
+            "candidates_kept": len(rank_candidates(text)),
+            "full_s": round(full_s, 3),
+            "fast_s": round(fast_s, 3),
+            "speedup": round(full_s / fast_s, 1) if fast_s else None,
+            "overlap": len(shared),
+            "overlap_ratio": round(len(shared) / len(full), 3) if full else None,
+            "warm_repeat_encoded_texts": repeat_encoded,
+            "full_keyphrases": full,
+            "fast_keyphrases": fast
+        })
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    assert not failures, "; ".join(failures)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+MMR selection benchmark and regression check: runs mmr_select_sentences
+against the previous per-candidate implementation on random embeddings
+(and on the token-overlap fallback), asserts the same picks and reports
+the speed-up.
+
+    python -m benchmarks.mmr --candidates 10000 --top-k 50
+"""
+import argparse
+import json
+import time
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+from benchmarks.corpus import synthetic_sentences
+from models.mmr_selection import mmr_select_sentences
+
+
+def reference_mmr_select_sentences(sentences, scores, sentence_embeddings, top_k=5, lambda_param=0.7):
+    """The original selection loop, kept verbatim as the equivalence oracle"""
+    if len(sentences) == 0:
+        return []
+
+    if len(sentences) <= top_k:
+        return sentences
+
+    selected_indices = []
+    remaining_indices = list(range(len(sentences)))
+
+    first_idx = np.argmax(scores)
+    selected_indices.append(first_idx)
+    remaining_indices.remove(first_idx)
+
+    while len(selected_indices) < top_k and remaining_indices:
+        mmr_scores = {}
+
+        for idx in remaining_indices:
+            relevance = scores[idx]
+
+            if sentence_embeddings is not None:
+                selected_embs = sentence_embeddings[selected_indices]
+                candidate_emb = sentence_embeddings[idx].reshape(1, -1)
+
+                similarities = cosine_similarity(candidate_emb, selected_embs)[0]
+                max_similarity = np.max(similarities)
+            else:
+                candidate_tokens = set(sentences[idx].lower().split())
+                max_similarity = 0
+                for sel_idx in selected_indices:
+                    selected_tokens = set(sentences[sel_idx].lower().split())
+                    if len(candidate_tokens | selected_tokens) > 0:
+                        sim = len(candidate_tokens & selected_tokens) / len(candidate_tokens | selected_tokens)
+                        max_similarity = max(max_similarity, sim)
+
+            mmr = lambda_param * relevance - (1 - lambda_param) * max_similarity * 10
+            mmr_scores[idx] = mmr
+
+        best_idx = max(mmr_scores.items(), key=lambda x: x[1])[0]
+        selected_indices.append(best_idx)
+        remaining_indices.remove(best_idx)
+
+    selected_indices.sort()
+    return [sentences[i] for i in selected_indices]
+
+
+def _time(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--candidates", type=int, default=10000)
+    parser.add_argument("--reference-candidates", type=int, default=500,
+                        help="Size of the case also run through the original loop")
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    report = {"benchmark": "mmr", "top_k": args.top_k, "cases": []}
+
+    # Parity: the original loop is O(k*n) Python calls, so check it on a smaller set
+    n = args.reference_candidates
+    sentences = synthetic_sentences(n)
+    scores = rng.normal(size=n)
+    embeddings = rng.normal(size=(n, args.dim)).astype(np.float32)
+    embeddings[::97] = 0.0
+    for name, emb in [("embeddings", embeddings), ("token_overlap", None)]:
+        expected, reference_s = _time(reference_mmr_select_sentences, sentences, scores, emb, args.top_k)
+        actual, current_s = _time(mmr_select_sentences, sentences, scores, emb, args.top_k)
+        assert actual == expected, f"selection mismatch on the {name} path"
+        report["cases"].append({
+            "path": name,
+            "candidates": n,
+            "reference_s": round(reference_s, 4),
+            "current_s": round(current_s, 4),
+            "speedup": round(reference_s / current_s, 1) if current_s else None
+        })
+
+    # Scale: the vectorized path alone on the full candidate set
+    n = args.candidates
+    sentences = synthetic_sentences(n, seed=1)
+    scores = rng.normal(size=n)
+    embeddings = rng.normal(size=(n, args.dim)).astype(np.float32)
+    for name, emb in [("embeddings", embeddings), ("token_overlap", None)]:
+        _, current_s = _time(mmr_select_sentences, sentences, scores, emb, args.top_k)
+        report["cases"].append({"path": name, "candidates": n, "current_s": round(current_s, 4)})
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Synthetic PDFs for the benchmarks, written locally with PyMuPDF: pages
+of academic-looking prose with a running header, page numbers,
+hyphenated line ends and the odd URL, figure caption and email.
+
+    python -m benchmarks.pdfs 50 paper-50.pdf
+"""
+import argparse
+import os
+import fitz
+from benchmarks.corpus import synthetic_page_text
+
+PAGE_RECT = fitz.Rect(50, 30, 562, 800)
+FONT_SIZE = 8
+
+
+def write_pdf(path, page_texts):
+    """Write one PDF page per text"""
+    doc = fitz.open()
+    for text in page_texts:
+        page = doc.new_page()
+        # insert_textbox writes nothing when the text overflows; shrink the font instead
+        fontsize = FONT_SIZE
+        while page.insert_textbox(PAGE_RECT, text, fontsize=fontsize) < 0:
+            fontsize -= 0.5
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def synthetic_page_texts(pages, seed=0, sentences_per_page=28):
+    return [synthetic_page_text(n, seed=seed, sentences_per_page=sentences_per_page) for n in range(pages)]
+
+
+def make_synthetic_pdf(path, pages, seed=0, sentences_per_page=28):
+    """Write a pages-long synthetic paper to path; the same seed gives the same text"""
+    return write_pdf(path, synthetic_page_texts(pages, seed, sentences_per_page))
+
+
+def cached_synthetic_pdf(directory, pages, seed=0):
+    """Path of the synthetic PDF for (pages, seed) in directory, generating it on first use"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"synthetic-{pages}p-seed{seed}.pdf")
+    if not os.path.exists(path):
+        make_synthetic_pdf(path, pages, seed)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("pages", type=int)
+    parser.add_argument("output")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    make_synthetic_pdf(args.output, args.pages, args.seed)
+    print(f"Wrote {args.pages} pages to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
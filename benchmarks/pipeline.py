@@ -0,0 +1,202 @@
+"""
+End-to-end pipeline benchmark on synthetic PDFs (5, 50 and 500 pages by
+default, generated locally with PyMuPDF).
+
+Each size runs in a fresh interpreter so its peak RSS is its own. For
+every size it reports:
+- each stage timed on its own: extraction, cleaning, keyphrases,
+  chunking, embeddings, scoring, MMR
+- end-to-end POST /upload latency through FastAPI's TestClient, for the
+  full tier and for the fast tier (no embeddings)
+- documents/min, pages/s and peak RSS
+
+Embedding caches, result caches and document state are cleared before
+every timed run, so each run sees a new document. Write the report with --output and compare
+JSON files across commits.
+
+    python -m benchmarks.pipeline --pages 5 50 500 --repeats 3 --output pipeline.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PDF_DIR = os.path.join(REPO_ROOT, "data", "benchmarks")
+
+
+def _median_time(fn, repeats, before=None):
+    """Median wall-clock seconds of fn() over repeats, calling before() untimed each time"""
+    samples = []
+    result = None
+    for _ in range(repeats):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def run_case(pages, repeats, pdf_dir):
+    """Benchmark one document size in this process; returns the case report"""
+    os.environ.setdefault("PDFSUM_WARMUP", "0")
+    from fastapi.testclient import TestClient
+    import app as api
+    from benchmarks.pdfs import cached_synthetic_pdf
+    from document_state import document_states
+    from inference import MAX_DOCUMENT_CHARS, PIPELINE_VERSION
+    from models import registry
+    from models.chunking import smart_chunk_by_sentences
+    from models.embedding_cache import embedding_cache
+    from models.embeddings import get_chunk_and_sentence_embeddings, apply_keyphrase_weights
+    from models.keyphrase_extraction import extract_keyphrases
+    from models.keyphrase_matcher import KeyphraseMatcher
+    from models.mmr_selection import mmr_select_sentences
+    from models.pdf_to_text import iter_raw_pages, clean_extracted_text, pdf_to_text_streaming
+    from models.sentence_scoring import compute_comprehensive_scores
+    from result_cache import make_result_cache
+
+    path = cached_synthetic_pdf(pdf_dir, pages)
+    registry.warm_up()
+
+    stages = {}
+    stages["extraction"], raw_pages = _median_time(lambda: list(iter_raw_pages(path)), repeats)
+    raw_text = "\n".join(page for page in raw_pages if page)
+    stages["cleaning"], _ = _median_time(lambda: clean_extracted_text(raw_text), repeats)
+    # What the pipeline runs: streamed extraction + per-page cleaning, capped
+    stages["extraction_streaming"], text = _median_time(
+        lambda: pdf_to_text_streaming(path, max_chars=MAX_DOCUMENT_CHARS), repeats
+    )
+
+    stages["keyphrases"], keyphrases = _median_time(
+        lambda: extract_keyphrases(text, top_n=25), repeats, before=embedding_cache.clear
+    )
+    stages["chunking"], (chunks, sentences) = _median_time(
+        lambda: smart_chunk_by_sentences(text, max_tokens=384, overlap_sentences=2), repeats
+    )
+    stages["embeddings"], (chunk_embeddings, sentence_embeddings) = _median_time(
+        lambda: get_chunk_and_sentence_embeddings(chunks, sentences), repeats, before=embedding_cache.clear
+    )
+    matcher = KeyphraseMatcher(keyphrases)
+    weighted = apply_keyphrase_weights(chunk_embeddings.copy(), chunks, matcher)
+    stages["scoring"], scores = _median_time(
+        lambda: compute_comprehensive_scores(sentences, weighted, chunks, matcher, text), repeats
+    )
+    stages["mmr"], _ = _median_time(
+        lambda: mmr_select_sentences(sentences, scores, sentence_embeddings, top_k=5), repeats
+    )
+
+    client = TestClient(api.app)
+    with open(path, "rb") as f:
+        pdf_bytes = f.read()
+
+    def reset_caches():
+        embedding_cache.clear()
+        document_states.clear()
+        api.result_cache = make_result_cache(PIPELINE_VERSION, backend="memory")
+
+    def upload(tier="full"):
+        response = client.post(
+            "/upload",
+            params={"include_metrics": "true", "tier": tier},
+            files={"file": (os.path.basename(path), pdf_bytes, "application/pdf")}
+        )
+        response.raise_for_status()
+        return response.json()
+
+    end_to_end_s, response = _median_time(upload, repeats, before=reset_caches)
+    fast_s, fast_response = _median_time(lambda: upload("fast"), repeats, before=reset_caches)
+
+    return {
+        "pages": pages,
+        "pdf_bytes": len(pdf_bytes),
+        "chars": len(text),
+        "sentences": len(sentences),
+        "chunks": len(chunks),
+        "stages_s": {stage: round(seconds, 4) for stage, seconds in stages.items()},
+        "upload_s": round(end_to_end_s, 4),
+        "upload_stage_timings_s": response["metrics"]["timings"],
+        "upload_fast_s": round(fast_s, 4),
+        "upload_fast_stage_timings_s": fast_response["metrics"]["timings"],
+        "upload_counters": response["metrics"]["counters"],
+        "docs_per_min": round(60 / end_to_end_s, 2),
+        "pages_per_s": round(pages / end_to_end_s, 2),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def run_case_subprocess(pages, repeats, pdf_dir):
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.pipeline", "--case", str(pages),
+         "--repeats", str(repeats), "--pdf-dir", pdf_dir],
+        cwd=REPO_ROOT,
+        env={**os.environ, "PDFSUM_WARMUP": "0"},
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{pages}-page case failed:\n{completed.stderr[-4000:]}")
+    # The case JSON is the last line; the pipeline prints progress before it
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _environment():
+    import torch
+    from inference import PIPELINE_VERSION
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "pipeline_version": PIPELINE_VERSION,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "cpu_count": os.cpu_count(),
+        "cuda": torch.cuda.is_available()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 50, 500])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--pdf-dir", default=DEFAULT_PDF_DIR, help="Where generated PDFs are kept between runs")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--case", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case is not None:
+        # Child mode: one size, JSON on the last stdout line
+        print(json.dumps(run_case(args.case, args.repeats, args.pdf_dir)))
+        return
+
+    report = {
+        "benchmark": "pipeline",
+        "repeats": args.repeats,
+        "environment": _environment(),
+        "cases": []
+    }
+    for pages in args.pages:
+        print(f"Benchmarking {pages}-page document...", file=sys.stderr)
+        report["cases"].append(run_case_subprocess(pages, args.repeats, args.pdf_dir))
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
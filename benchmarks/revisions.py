@@ -0,0 +1,110 @@
+"""
+Incremental re-summarization benchmark: summarizes a synthetic paper,
+then a revision of it with a few sentences edited, passing the same
+document_name so the second run finds the first one's document state.
+The revision is also summarized cold (document state and embedding
+cache cleared) for comparison.
+
+Reports latency, reused sentences and embedding cache hits of both
+runs. Token reuse must not change the output, so the run fails if the
+warm and cold revisions differ in chunks or, unless the previous
+keyphrases were reused, in summary.
+
+    python -m benchmarks.revisions --pages 50 --edits 3 --output revisions.json
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from benchmarks.corpus import synthetic_sentences
+from benchmarks.pdfs import synthetic_page_texts, write_pdf
+from document_state import document_states
+from inference import process_pdf_and_summarize
+from models import registry
+from models.embedding_cache import embedding_cache
+
+
+def revise_pages(page_texts, edits, seed=0):
+    """Copy of page_texts with edits lines (spread over the document) replaced by new prose"""
+    rng = random.Random(seed)
+    revised = list(page_texts)
+    replacements = synthetic_sentences(edits, seed=seed + 1)
+    for replacement in replacements:
+        page = rng.randrange(len(revised))
+        lines = revised[page].split("\n")
+        # Skip the running header
+        line = rng.randrange(2, len(lines))
+        lines[line] = replacement
+        revised[page] = "\n".join(lines)
+    return revised
+
+
+def _summarize(path, document_name, summary_sentences):
+    hits_before = embedding_cache.stats()["hits"]
+    start = time.perf_counter()
+    result = process_pdf_and_summarize(path, summary_sentences=summary_sentences, document_name=document_name)
+    seconds = time.perf_counter() - start
+    return result, seconds, embedding_cache.stats()["hits"] - hits_before
+
+
+def _run_report(result, seconds, cache_hits):
+    return {
+        "seconds": round(seconds, 3),
+        "sentences": result["num_sentences"],
+        "chunks": result["num_chunks"],
+        "embedding_cache_hits": cache_hits,
+        "revision": result["revision"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--edits", type=int, default=3, help="Lines replaced in the revision")
+    parser.add_argument("--summary-sentences", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    registry.warm_up()
+    page_texts = synthetic_page_texts(args.pages)
+    document_name = f"synthetic-{args.pages}p.pdf"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        original_path = write_pdf(os.path.join(tmp, "original.pdf"), page_texts)
+        revised_path = write_pdf(os.path.join(tmp, "revised.pdf"), revise_pages(page_texts, args.edits))
+
+        def reset():
+            document_states.clear()
+            embedding_cache.clear()
+
+        reset()
+        original = _summarize(original_path, document_name, args.summary_sentences)
+        warm = _summarize(revised_path, document_name, args.summary_sentences)
+        reset()
+        cold = _summarize(revised_path, document_name, args.summary_sentences)
+
+    report = {
+        "benchmark": "revisions",
+        "pages": args.pages,
+        "edits": args.edits,
+        "original": _run_report(*original),
+        "revision_cold": _run_report(*cold),
+        "revision_warm": _run_report(*warm),
+        "speedup": round(cold[1] / warm[1], 2)
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    warm_result, cold_result = warm[0], cold[0]
+    assert warm_result["revision"]["previous_version"], "revision did not find the original's state"
+    assert warm_result["num_chunks"] == cold_result["num_chunks"], "token reuse changed the chunks"
+    if not warm_result["revision"]["keyphrases_reused"]:
+        assert warm_result["summary"] == cold_result["summary"], "token reuse changed the summary"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Encoder scheduler benchmark: several threads embed small documents at
+the same time, the way concurrent /upload requests do. It runs once
+with models.embeddings.encoder_scheduler batching across threads and
+once with each thread running its own batches. The embedding cache is
+cleared before each run.
+
+Reports texts/s, forward passes and the scheduler's batch fill and wait.
+The run fails if embeddings differ beyond --atol, since padding to
+another request's length must not change a text's vectors.
+
+    python -m benchmarks.scheduler --threads 8 --documents 64 --output scheduler.json
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from benchmarks.corpus import synthetic_sentences
+from models import embeddings
+from models import registry
+from models.embedding_cache import embedding_cache
+from models.encoder_scheduler import EncoderScheduler, ENCODER_MAX_BATCH, ENCODER_MAX_WAIT_MS
+from models.instrumentation import pipeline_run
+
+
+def _embed_all(documents, threads):
+    def embed(sentences):
+        with pipeline_run() as run:
+            vectors = embeddings.get_sentence_embeddings_batch(sentences)
+        return vectors, run.counters["forward_passes"]
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(embed, documents))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--documents", type=int, default=64)
+    parser.add_argument("--sentences", type=int, default=6, help="Texts per document")
+    parser.add_argument("--max-batch", type=int, default=ENCODER_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=ENCODER_MAX_WAIT_MS)
+    parser.add_argument("--atol", type=float, default=1e-4)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    registry.warm_up()
+    documents = [synthetic_sentences(args.sentences, seed=i) for i in range(args.documents)]
+    texts = args.documents * args.sentences
+
+    runs = {}
+    scheduler = EncoderScheduler(embeddings._run_encoder_batch, args.max_batch, args.max_wait_ms)
+    for name, active in (("per_thread", None), ("scheduler", scheduler)):
+        embeddings.encoder_scheduler = active
+        embedding_cache.clear()
+        start = time.perf_counter()
+        results = _embed_all(documents, args.threads)
+        seconds = time.perf_counter() - start
+        runs[name] = {
+            "seconds": round(seconds, 3),
+            "texts_per_s": round(texts / seconds, 1),
+            "forward_passes": sum(passes for _, passes in results),
+            "vectors": [vectors for vectors, _ in results]
+        }
+
+    drift = max(
+        float(np.abs(a - b).max())
+        for a, b in zip(runs["per_thread"].pop("vectors"), runs["scheduler"].pop("vectors"))
+    )
+    report = {
+        "benchmark": "scheduler",
+        "threads": args.threads,
+        "documents": args.documents,
+        "texts": texts,
+        **runs,
+        "scheduler_stats": scheduler.stats(),
+        "speedup": round(runs["per_thread"]["seconds"] / runs["scheduler"]["seconds"], 2),
+        "max_abs_diff": drift
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    assert drift <= args.atol, f"scheduled embeddings drift by {drift} > {args.atol}"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Sentence scoring benchmark and regression check: runs
+compute_comprehensive_scores against the previous per-sentence loop on a
+synthetic document with overlapping chunks, asserts the scores match and
+reports the speed-up. Also checks that KeyphraseMatcher.positions()
+offsets index the original text when lowercasing changes its length.
+
+    python -m benchmarks.scoring --sentences 5000 --keyphrases 25
+"""
+import argparse
+import json
+import re
+import time
+import numpy as np
+from benchmarks.corpus import synthetic_sentences, VOCABULARY
+from models.keyphrase_matcher import KeyphraseMatcher
+from models.sentence_scoring import compute_comprehensive_scores
+
+
+def reference_compute_comprehensive_scores(sentences, chunk_embeddings, chunks, keyphrases, text):
+    """The original scoring loop, kept verbatim as the equivalence oracle"""
+    scores = np.zeros(len(sentences))
+
+    for i, sent in enumerate(sentences):
+        score = 0.0
+        sent_lower = sent.lower()
+
+        kp_matches = sum(1 for kp in keyphrases if kp.lower() in sent_lower)
+        score += kp_matches * 5.0
+
+        important_sections = [
+            'abstract', 'introduction', 'conclusion', 'result', 'finding',
+            'method', 'approach', 'propose', 'present', 'demonstrate',
+            'show', 'achieve', 'improve', 'framework', 'model', 'system'
+        ]
+        section_matches = sum(1 for keyword in important_sections if keyword in sent_lower)
+        score += section_matches * 2.0
+
+        position_score = 1.0 / (1.0 + i * 0.01)
+        score += position_score * 1.0
+
+        words = sent.split()
+        word_count = len(words)
+        if 10 <= word_count <= 35:
+            score += 2.0
+        elif 8 <= word_count <= 40:
+            score += 1.0
+        elif word_count < 5:
+            score -= 2.0
+
+        if sent[0].isupper() and sent[-1] in '.!?':
+            score += 1.0
+
+        non_alpha = sum(1 for c in sent if not c.isalnum() and c not in ' .,;:!?')
+        if non_alpha > len(sent) * 0.2:
+            score -= 1.0
+
+        for chunk_idx, chunk_info in enumerate(chunks):
+            if i in chunk_info['sentence_indices']:
+                chunk_emb_score = np.linalg.norm(chunk_embeddings[chunk_idx])
+                score += chunk_emb_score * 0.3
+                break
+
+        if re.search(r'\[\d+\]|\(\d{4}\)|et al\.', sent):
+            score -= 1.5
+
+        if re.match(r'^(Table|Figure|Fig\.|Equation)\s+\d', sent, re.I):
+            score -= 3.0
+
+        scores[i] = max(0, score)
+
+    return scores
+
+
+def _synthetic_inputs(n_sentences, n_keyphrases, seed=0):
+    """Sentences with some short, symbol-heavy and caption lines, overlapping chunks and keyphrases"""
+    rng = np.random.default_rng(seed)
+    sentences = synthetic_sentences(n_sentences, seed=seed)
+    for i in range(0, n_sentences, 37):
+        sentences[i] = rng.choice(["Table 3 shows results.", "x = (a+b)/{c*d} ~ #42 $$", "Fig. 2", "ok."])
+
+    chunks = []
+    start = 0
+    while start < n_sentences:
+        stop = min(n_sentences, start + int(rng.integers(4, 15)))
+        chunks.append({'text': ' '.join(sentences[start:stop]), 'sentence_indices': list(range(start, stop))})
+        start = max(start + 1, stop - 2)
+    chunk_embeddings = rng.normal(size=(len(chunks), 768)).astype(np.float32)
+
+    keyphrases = [
+        ' '.join(rng.choice(VOCABULARY, size=int(rng.integers(1, 3)))).title()
+        for _ in range(n_keyphrases)
+    ]
+    return sentences, chunk_embeddings, chunks, keyphrases
+
+
+def _time(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def check_positions():
+    """"İ" lowercases to two characters, shifting every later offset of the lowered text"""
+    text = "İstanbul hosts Neural Networks and neural networks"
+    for word_boundary in (False, True):
+        found = KeyphraseMatcher(["neural networks"], word_boundary=word_boundary).positions(text)
+        assert [text[start:end] for start, end, _ in found] == ["Neural Networks", "neural networks"], \
+            f"positions() offsets are off (word_boundary={word_boundary}): {found}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sentences", type=int, default=5000)
+    parser.add_argument("--keyphrases", type=int, default=25)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    sentences, chunk_embeddings, chunks, keyphrases = _synthetic_inputs(args.sentences, args.keyphrases)
+    text = ' '.join(sentences)
+
+    expected, reference_s = _time(reference_compute_comprehensive_scores,
+                                  sentences, chunk_embeddings, chunks, keyphrases, text)
+    actual, current_s = _time(compute_comprehensive_scores,
+                              sentences, chunk_embeddings, chunks, keyphrases, text)
+    assert np.allclose(actual, expected, rtol=1e-6, atol=1e-6), "scores changed"
+    check_positions()
+
+    report = {
+        "benchmark": "scoring",
+        "sentences": args.sentences,
+        "chunks": len(chunks),
+        "keyphrases": args.keyphrases,
+        "max_abs_diff": float(np.max(np.abs(actual - expected))),
+        "reference_s": round(reference_s, 4),
+        "current_s": round(current_s, 4),
+        "speedup": round(reference_s / current_s, 1) if current_s else None
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
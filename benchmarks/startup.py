@@ -0,0 +1,65 @@
+"""
+Cold-start benchmark: time to import the API module and to warm up the
+models, each measured in a fresh interpreter.
+
+    python -m benchmarks.startup --repeats 3 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+from models import registry
+start = time.perf_counter()
+components = registry.warm_up()
+warm = time.perf_counter() - start
+print(json.dumps({"import_s": imported, "warm_up_s": warm, "components_s": components}))
+"""
+
+
+def run_once():
+    env = {**os.environ, "PDFSUM_WARMUP": "0"}
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    # The probe's JSON is the last line; model loading prints before it
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.repeats)]
+    report = {
+        "benchmark": "startup",
+        "repeats": args.repeats,
+        "import_s_median": statistics.median(r["import_s"] for r in runs),
+        "warm_up_s_median": statistics.median(r["warm_up_s"] for r in runs),
+        "runs": runs
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
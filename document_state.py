@@ -0,0 +1,137 @@
+"""
+State kept from earlier summarizations so a revised upload of the same
+document only redoes what changed.
+
+A document is identified by its normalized filename ("paper_v2.pdf" and
+"paper (1).pdf" both become "paper") plus a 64-bit SimHash of its text.
+Revisions with small edits keep most bits of the hash, so the closest
+stored state within DOCUMENT_STATE_MAX_DISTANCE bits counts as the
+previous version.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+DOCUMENT_STATE_SIZE = int(os.environ.get("DOCUMENT_STATE_SIZE", 200))
+# Hamming distance (of 64 bits) up to which two texts count as versions of one document
+DOCUMENT_STATE_MAX_DISTANCE = int(os.environ.get("DOCUMENT_STATE_MAX_DISTANCE", 12))
+# Up to this distance the edit is small enough to keep the previous keyphrases
+KEYPHRASE_REUSE_MAX_DISTANCE = int(os.environ.get("KEYPHRASE_REUSE_MAX_DISTANCE", 3))
+
+# Markers need a separator before them ("spectroscopy" keeps its "copy");
+# only "(2)" may follow the name directly
+_VERSION_SUFFIX_RE = re.compile(
+    r'([\s._-]+(v\d+(\.\d+)*|rev\d*|r\d+|draft\d*|final|copy|\d{8}|\d{4}-\d{2}-\d{2})|[\s._-]*\(\d+\))$', re.I
+)
+_WORD_RE = re.compile(r'\w+')
+_BIT_SHIFTS = np.arange(64, dtype=np.uint64)
+
+
+def document_key(filename):
+    """Filename without directory, extension or trailing version markers, lowercased"""
+    stem = os.path.splitext(os.path.basename(filename or ""))[0].lower().strip()
+    while True:
+        shorter = _VERSION_SUFFIX_RE.sub("", stem)
+        if shorter == stem or not shorter:
+            return stem
+        stem = shorter
+
+
+def simhash(text, shingle=3):
+    """64-bit SimHash over word shingles; near-identical texts differ in few bits"""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < shingle:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle]) for i in range(len(words) - shingle + 1)]
+
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+    bits = (hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int(np.sum(majority.astype(np.uint64) << _BIT_SHIFTS))
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class DocumentState:
+    """What a finished run leaves behind for the next revision"""
+
+    def __init__(self, key, fingerprint, sentences, token_counts, token_starts, keyphrases):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.sentences = sentences
+        self.token_counts = token_counts
+        self.token_starts = token_starts
+        self.keyphrases = keyphrases
+        self.updated_at = time.time()
+
+
+class DocumentStateStore:
+    """In-process LRU of DocumentState, a few per document key"""
+
+    def __init__(self, max_entries=DOCUMENT_STATE_SIZE, max_distance=DOCUMENT_STATE_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._states = OrderedDict()  # (key, fingerprint) -> DocumentState
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def find(self, filename, fingerprint):
+        """
+        The stored state of the closest earlier version, or None.
+        Returns (state, distance).
+        """
+        key = document_key(filename)
+        with self._lock:
+            best = None
+            for (state_key, state_fingerprint), state in self._states.items():
+                if state_key != key:
+                    continue
+                distance = hamming_distance(state_fingerprint, fingerprint)
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (state, distance)
+
+            if best is None:
+                self.misses += 1
+                return None, None
+            self.hits += 1
+            self._states.move_to_end((best[0].key, best[0].fingerprint))
+            return best
+
+    def save(self, filename, fingerprint, sentences, token_counts, token_starts, keyphrases):
+        key = document_key(filename)
+        state = DocumentState(key, fingerprint, sentences, token_counts, token_starts, keyphrases)
+        with self._lock:
+            self._states[(key, fingerprint)] = state
+            self._states.move_to_end((key, fingerprint))
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+        return state
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._states),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+            self.hits = self.misses = 0
+
+
+document_states = DocumentStateStore()
@@ -0,0 +1,94 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+PIPELINE_EXECUTOR = os.environ.get("PIPELINE_EXECUTOR", "thread")  # "thread" or "process"
+PIPELINE_CONCURRENCY = int(os.environ.get("PIPELINE_CONCURRENCY", 2))
+PIPELINE_MAX_QUEUE = int(os.environ.get("PIPELINE_MAX_QUEUE", 8))
+PIPELINE_RETRY_AFTER = int(os.environ.get("PIPELINE_RETRY_AFTER", 30))
+
+
+class ExecutorSaturated(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Pipeline executor saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Runs blocking pipeline calls off the event loop with at most
+    max_workers running and max_queue waiting. Anything beyond that is
+    rejected with ExecutorSaturated instead of piling up behind the
+    current requests.
+
+    The thread pool suits the torch path (forward passes release the GIL).
+    The process pool isolates each call but loads the models once per
+    worker process and cannot carry unpicklable arguments such as
+    progress callbacks.
+    """
+
+    def __init__(self, kind=PIPELINE_EXECUTOR, max_workers=PIPELINE_CONCURRENCY,
+                 max_queue=PIPELINE_MAX_QUEUE, retry_after=PIPELINE_RETRY_AFTER):
+        if kind == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+        elif kind == "process":
+            # forkserver: never fork the API process, which holds torch threads and the
+            # models; spawn where forkserver does not exist (Windows)
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(max_workers=max_workers,
+                                             mp_context=multiprocessing.get_context(start_method))
+        else:
+            raise ValueError(f"Unknown executor kind: {kind}")
+
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._in_flight = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit fn or raise ExecutorSaturated; returns a concurrent.futures.Future"""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturated(self.retry_after)
+            self._in_flight += 1
+
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Await fn(*args, **kwargs) on the pool without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - self.max_workers),
+                "rejected": self._rejected
+            }
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+pipeline_executor = BoundedExecutor()
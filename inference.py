@@ -1,73 +1,271 @@
-from models.pdf_to_text import pdf_to_text_pymupdf as pdf_to_text
+from models.pdf_to_text import pdf_to_text_streaming
 from models.keyphrase_extraction import extract_keyphrases
-from models.chunking import smart_chunk_by_sentences
-from models.embeddings import get_sentence_embedding, get_chunk_embeddings_batch
+from models.keyphrase_matcher import KeyphraseMatcher
+from models.chunking import chunk_with_tokens
+from models.embeddings import (
+    apply_keyphrase_weights,
+    get_sentence_embeddings_batch,
+    get_chunk_embeddings_batch,
+    get_chunk_and_sentence_embeddings
+)
 from models.sentence_scoring import compute_comprehensive_scores
 from models.mmr_selection import mmr_select_sentences
-import numpy as np
+from models.instrumentation import pipeline_run, stage_timer
+from stage_graph import Stage, run_stage_graph, PIPELINE_STAGE_WORKERS
+from document_state import document_states, simhash, KEYPHRASE_REUSE_MAX_DISTANCE
+import threading
 
-def process_pdf_and_summarize(pdf_path, summary_sentences=5):
+# Bump whenever a change to the pipeline can change its output; cached results key on it
+PIPELINE_VERSION = "2.5"
+
+EMBEDDING_MODES = ("single_pass", "two_pass")
+
+# Longer documents are cut here; extraction stops reading pages once it is reached
+MAX_DOCUMENT_CHARS = 100000
+
+PIPELINE_STAGES = ("extraction", "keyphrases", "chunking", "embeddings", "scoring", "selection")
+
+# "fast": heuristic scores and token-overlap MMR, no embeddings
+# "full": the complete pipeline
+# "both": the fast summary is reported as soon as it is ready, then the full one
+SUMMARY_TIERS = ("fast", "full", "both")
+TIER_STAGES = {
+    "fast": ("extraction", "keyphrases", "chunking", "fast_summary"),
+    "full": PIPELINE_STAGES,
+    "both": ("extraction", "keyphrases", "chunking", "fast_summary", "embeddings", "scoring", "selection"),
+}
+
+def _report(progress_callback, stage, **info):
+    """Tell the caller a stage finished; progress must never break the pipeline"""
+    if progress_callback is None:
+        return
+    try:
+        progress_callback(stage, info)
+    except Exception as e:
+        print(f"   ⚠️ Progress callback failed: {e}")
+
+def _timed_stage(stage, fn):
+    """Run a stage body inside its instrumentation timer"""
+    def run(*args):
+        with stage_timer(stage):
+            return fn(*args)
+    return run
+
+def process_pdf_and_summarize(pdf_path, summary_sentences=5, embedding_mode="single_pass",
+                              progress_callback=None, stage_workers=PIPELINE_STAGE_WORKERS,
+                              document_name=None, tier="full"):
     """
     Complete pipeline for PDF summarization with improved coherence
+
+    embedding_mode:
+    - "single_pass": encode each chunk once and pool sentence vectors from it
+    - "two_pass": encode chunks and every sentence separately (reference mode)
+
+    Keyphrase extraction runs concurrently with chunking and embeddings;
+    chunk embeddings are keyphrase-weighted afterwards, when scoring.
+    stage_workers=1 runs the stages one after another.
+
+    progress_callback, if given, is called as progress_callback(stage, info)
+    after each of the tier's TIER_STAGES with a dict of stage statistics. Calls
+    are serialized but concurrent stages may finish in either order.
+    Long stages also report partial progress before they finish, with
+    info {"in_progress": True, "done": i, "total": n} (embeddings: texts
+    encoded so far).
+
+    The result carries per-stage wall-clock "timings" in seconds and the
+    run's "metrics": timings, work counters (tokens, sentences, chunks,
+    forward passes), the process's peak memory and profile paths.
+
+    document_name (usually the uploaded filename) enables incremental
+    re-summarization: a revision of a document seen before reuses the
+    tokenization of unchanged sentences and, for small edits, the previous
+    keyphrases. Unchanged chunks hit the embedding cache. The result's
+    "revision" says what was reused.
+
+    tier is one of SUMMARY_TIERS. "fast" skips embeddings altogether and
+    typically returns in about a second. "both" runs the full pipeline but
+    reports the fast summary through progress_callback ("fast_summary"
+    stage) first, and returns it as "fast_summary" next to the full one.
     """
-    
-    print(f"[1/6] Extracting text from PDF...")
-    text = pdf_to_text(pdf_path)
-    
-    # Limit very long documents
-    if len(text) > 100000:
-        print(f"   Document too long ({len(text)} chars), using first 100k characters")
-        text = text[:100000]
-    
-    print(f"   Extracted {len(text)} characters")
-    
-    print(f"[2/6] Extracting keyphrases...")
-    keyphrases = extract_keyphrases(text, top_n=25)
-    print(f"   Found {len(keyphrases)} keyphrases")
-    
-    print(f"[3/6] Chunking document by sentences...")
-    chunks, sentences = smart_chunk_by_sentences(text, max_tokens=384, overlap_sentences=2)
-    print(f"   Created {len(chunks)} chunks from {len(sentences)} sentences")
-    
-    print(f"[4/6] Computing embeddings...")
-    chunk_embeddings = get_chunk_embeddings_batch(chunks, keyphrases)
-    
-    # Get sentence embeddings for MMR
-    sentence_embeddings = []
-    for sent in sentences:
-        emb = get_sentence_embedding(sent)
-        sentence_embeddings.append(emb)
-    sentence_embeddings = np.array(sentence_embeddings)
-    print(f"   Computed embeddings for {len(chunks)} chunks and {len(sentences)} sentences")
-    
-    print(f"[5/6] Scoring sentences...")
-    scores = compute_comprehensive_scores(
-        sentences, 
-        chunk_embeddings, 
-        chunks, 
-        keyphrases, 
-        text
-    )
-    print(f"   Top 5 scores: {sorted(scores, reverse=True)[:5]}")
-    
-    print(f"[6/6] Selecting diverse sentences using MMR...")
-    summary_sentences_list = mmr_select_sentences(
-        sentences,
-        scores,
-        sentence_embeddings,
-        top_k=summary_sentences,
-        lambda_param=0.7
-    )
-    
+    if embedding_mode not in EMBEDDING_MODES:
+        raise ValueError(f"Unknown embedding_mode: {embedding_mode}")
+    if tier not in SUMMARY_TIERS:
+        raise ValueError(f"Unknown tier: {tier}")
+
+    report_lock = threading.Lock()
+
+    def report(stage, **info):
+        with report_lock:
+            _report(progress_callback, stage, **info)
+
+    def stage_progress(stage, done, total):
+        report(stage, in_progress=True, done=done, total=total)
+
+    def extraction():
+        print(f"[1/6] Extracting text from PDF...")
+        text = pdf_to_text_streaming(pdf_path, max_chars=MAX_DOCUMENT_CHARS)
+
+        # Limit very long documents
+        if len(text) >= MAX_DOCUMENT_CHARS:
+            print(f"   Document too long, stopped extraction at {MAX_DOCUMENT_CHARS} characters")
+
+        print(f"   Extracted {len(text)} characters")
+        report("extraction", chars=len(text))
+        return text
+
+    def revision_lookup(text):
+        if document_name is None:
+            return None, None, None
+        fingerprint = simhash(text)
+        previous, distance = document_states.find(document_name, fingerprint)
+        if previous is not None:
+            print(f"   Found previous version of {document_name} ({distance} bits apart)")
+        return fingerprint, previous, distance
+
+    def keyphrase_extraction(text, revision):
+        print(f"[2/6] Extracting keyphrases...")
+        _, previous, distance = revision
+        if previous is not None and distance <= KEYPHRASE_REUSE_MAX_DISTANCE:
+            print(f"   Small edit, reusing keyphrases of the previous version")
+            keyphrases = previous.keyphrases
+        else:
+            keyphrases = extract_keyphrases(text, top_n=25)
+        print(f"   Found {len(keyphrases)} keyphrases")
+        report("keyphrases", count=len(keyphrases), keyphrases=keyphrases[:15])
+        return keyphrases
+
+    def chunking(text, revision):
+        print(f"[3/6] Chunking document by sentences...")
+        _, previous, _ = revision
+        previous_tokens = None
+        if previous is not None:
+            previous_tokens = (previous.sentences, previous.token_counts, previous.token_starts)
+        chunks, sentences, token_counts, token_starts, reused = chunk_with_tokens(
+            text, max_tokens=384, overlap_sentences=2, previous=previous_tokens
+        )
+        print(f"   Created {len(chunks)} chunks from {len(sentences)} sentences")
+        if previous is not None:
+            print(f"   Reused tokenization of {reused}/{len(sentences)} sentences")
+        report("chunking", chunks=len(chunks), sentences=len(sentences), reused_sentences=reused)
+        return chunks, sentences, (token_counts, token_starts, reused)
+
+    def fast_summary(text, keyphrases, chunked):
+        chunks, sentences, _ = chunked
+        print(f"[fast] Heuristic summary without embeddings...")
+        scores = compute_comprehensive_scores(sentences, None, chunks, KeyphraseMatcher(keyphrases), text)
+        summary_sentences_list = mmr_select_sentences(
+            sentences,
+            scores,
+            None,  # token-overlap similarity
+            top_k=summary_sentences,
+            lambda_param=0.7
+        )
+        report("fast_summary", sentences=len(summary_sentences_list), summary=" ".join(summary_sentences_list))
+        return scores, summary_sentences_list
+
+    def embeddings(chunked):
+        chunks, sentences, _ = chunked
+        print(f"[4/6] Computing embeddings...")
+        # Unweighted here: keyphrases may not be ready yet
+        if embedding_mode == "single_pass":
+            chunk_embeddings, sentence_embeddings = get_chunk_and_sentence_embeddings(chunks, sentences)
+        else:
+            chunk_embeddings = get_chunk_embeddings_batch(chunks)
+
+            # Get sentence embeddings for MMR
+            sentence_embeddings = get_sentence_embeddings_batch(sentences)
+        print(f"   Computed embeddings for {len(chunks)} chunks and {len(sentences)} sentences")
+        report("embeddings", chunks=len(chunks), sentences=len(sentences))
+        return chunk_embeddings, sentence_embeddings
+
+    def scoring(text, keyphrases, chunked, embedded):
+        chunks, sentences, _ = chunked
+        chunk_embeddings, _ = embedded
+        print(f"[5/6] Scoring sentences...")
+        # One matcher serves keyphrase weighting and scoring
+        keyphrase_matcher = KeyphraseMatcher(keyphrases)
+        chunk_embeddings = apply_keyphrase_weights(chunk_embeddings, chunks, keyphrase_matcher)
+        scores = compute_comprehensive_scores(
+            sentences, 
+            chunk_embeddings, 
+            chunks, 
+            keyphrase_matcher, 
+            text
+        )
+        print(f"   Top 5 scores: {sorted(scores, reverse=True)[:5]}")
+        report("scoring", sentences=len(scores))
+        return scores
+
+    def selection(chunked, embedded, scores):
+        _, sentences, _ = chunked
+        _, sentence_embeddings = embedded
+        print(f"[6/6] Selecting diverse sentences using MMR...")
+        summary_sentences_list = mmr_select_sentences(
+            sentences,
+            scores,
+            sentence_embeddings,
+            top_k=summary_sentences,
+            lambda_param=0.7
+        )
+        report("selection", sentences=len(summary_sentences_list))
+        return summary_sentences_list
+
+    stages = [
+        Stage("extraction", _timed_stage("extraction", extraction)),
+        Stage("revision", revision_lookup, deps=["extraction"]),
+        Stage("keyphrases", _timed_stage("keyphrases", keyphrase_extraction), deps=["extraction", "revision"]),
+        Stage("chunking", _timed_stage("chunking", chunking), deps=["extraction", "revision"]),
+    ]
+    if tier != "full":
+        stages.append(Stage("fast_summary", _timed_stage("fast_summary", fast_summary),
+                            deps=["extraction", "keyphrases", "chunking"]))
+    if tier != "fast":
+        stages += [
+            Stage("embeddings", _timed_stage("embeddings", embeddings), deps=["chunking"]),
+            Stage("scoring", _timed_stage("scoring", scoring),
+                  deps=["extraction", "keyphrases", "chunking", "embeddings"]),
+            Stage("selection", _timed_stage("selection", selection),
+                  deps=["chunking", "embeddings", "scoring"]),
+        ]
+
+    with pipeline_run(progress_callback=stage_progress) as run:
+        results, _ = run_stage_graph(stages, max_workers=stage_workers)
+    timings = run.timings()
+
+    keyphrases = results["keyphrases"]
+    chunks, sentences, (token_counts, token_starts, reused) = results["chunking"]
+    if tier == "fast":
+        scores, summary_sentences_list = results["fast_summary"]
+    else:
+        scores = results["scoring"]
+        summary_sentences_list = results["selection"]
     summary = " ".join(summary_sentences_list)
+
+    revision = None
+    fingerprint, previous, distance = results["revision"]
+    if document_name is not None:
+        document_states.save(document_name, fingerprint, sentences, token_counts, token_starts, keyphrases)
+        revision = {
+            "previous_version": previous is not None,
+            "fingerprint_distance": distance,
+            "reused_sentences": reused,
+            "changed_sentences": len(sentences) - reused if previous is not None else len(sentences),
+            "keyphrases_reused": previous is not None and keyphrases is previous.keyphrases
+        }
     
     print(f"✅ Summary generation complete!")
     print(f"   Summary length: {len(summary)} characters, {len(summary_sentences_list)} sentences")
+    print(f"   Stage timings: {timings}")
     
     return {
         "summary": summary,
+        "tier": "fast" if tier == "fast" else "full",
+        "fast_summary": " ".join(results["fast_summary"][1]) if tier == "both" else None,
         "keyphrases": keyphrases[:15],
         "num_sentences": len(sentences),
         "num_chunks": len(chunks),
-        "top_sentence_scores": sorted(scores, reverse=True)[:10]
+        "top_sentence_scores": sorted(scores, reverse=True)[:10],
+        "timings": timings,
+        "metrics": run.as_dict(),
+        "revision": revision
     }
\ No newline at end of file
@@ -1,6 +1,79 @@
+"""
+Summarize PDFs from the command line, one JSON line per document.
+
+    python main.py papers/ extra.pdf --output summaries.jsonl
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+
+def _expand(paths):
+    from batch import list_pdfs
+    for path in paths:
+        if os.path.isdir(path):
+            yield from list_pdfs(path)
+        else:
+            yield path
+
+
 def main():
-    print("Hello from nlp!")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument("--summary-sentences", type=int, default=5)
+    parser.add_argument("--tier", choices=["full", "fast"], default="full",
+                        help="fast skips embeddings: heuristic scores only")
+    parser.add_argument("--output", help="JSONL file to write (default: stdout)")
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="Skip files already summarized in --output; failed ones are retried and new lines appended")
+    args = parser.parse_args()
+
+    from batch import iter_batch_summaries
+
+    pdf_paths = list(_expand(args.paths))
+    skipped = 0
+    if args.skip_existing and args.output and os.path.exists(args.output):
+        # The latest line per path wins, so a retried failure counts once it finishes
+        statuses = {}
+        with open(args.output) as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    statuses[result.get("path")] = result.get("status")
+        remaining = [path for path in pdf_paths if statuses.get(path) != "finished"]
+        skipped = len(pdf_paths) - len(remaining)
+        pdf_paths = remaining
+
+    out = open(args.output, "a" if args.skip_existing else "w") if args.output else sys.stdout
+    start = time.perf_counter()
+    finished = failed = 0
+    try:
+        # Pipeline progress goes to stderr so stdout stays valid JSONL
+        with contextlib.redirect_stdout(sys.stderr):
+            for path, result in zip(pdf_paths, iter_batch_summaries(
+                ((os.path.basename(path), path) for path in pdf_paths),
+                summary_sentences=args.summary_sentences,
+                tier=args.tier
+            )):
+                result["path"] = path
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                if result["status"] == "finished":
+                    finished += 1
+                else:
+                    failed += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {finished} summarized, {failed} failed, {skipped} skipped in {elapsed:.1f}s "
+          f"({finished / elapsed * 3600 if elapsed else 0:.0f} documents/hour)", file=sys.stderr)
+    return 1 if failed else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,38 +1,77 @@
-from transformers import AutoTokenizer
+from models.registry import get_embedding_tokenizer, ensure_nltk_data
+from models import instrumentation
+import numpy as np
+import difflib
 import nltk
 
-tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased", use_fast=True)
-nltk.download('punkt', quiet=True)
+def tokenize_sentences(sentences):
+    """
+    Tokenize all sentences in one fast-tokenizer call.
+    Returns (token_counts, token_starts) where token_starts[i] holds the
+    character offset at which each token of sentence i begins.
+    """
+    if not sentences:
+        return [], []
 
-def smart_chunk_by_sentences(text, max_tokens=384, overlap_sentences=2):
-    """Chunk text by sentences to preserve semantic boundaries"""
-    sentences = nltk.sent_tokenize(text)
-    
+    encoded = get_embedding_tokenizer()(
+        sentences,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        return_attention_mask=False,
+        return_token_type_ids=False
+    )
+    token_counts = [len(ids) for ids in encoded['input_ids']]
+    token_starts = [[start for start, _ in offsets] for offsets in encoded['offset_mapping']]
+    return token_counts, token_starts
+
+def _word_token_counts(sent, token_starts):
+    """
+    Split a sentence on whitespace and count the tokens inside each word
+    from the sentence's token offsets. BERT pre-tokenization never crosses
+    whitespace, so this equals encoding every word on its own.
+    """
+    words = sent.split()
+    word_starts = []
+    word_ends = []
+    pos = 0
+    for word in words:
+        start = sent.index(word, pos)
+        pos = start + len(word)
+        word_starts.append(start)
+        word_ends.append(pos)
+
+    starts = np.asarray(token_starts)
+    counts = (np.searchsorted(starts, word_ends, side='left')
+              - np.searchsorted(starts, word_starts, side='left'))
+    return words, counts.tolist()
+
+def chunk_sentences(sentences, token_counts, token_starts, max_tokens=384, overlap_sentences=2):
+    """
+    Greedy sentence packing from precomputed token counts. Produces the
+    same chunks as tokenizing every sentence (and every word of oversized
+    sentences) separately.
+    """
     chunks = []
-    current_chunk = []
+    chunk_start = 0  # current chunk covers sentences[chunk_start:i]
     current_tokens = 0
-    
+
     for i, sent in enumerate(sentences):
-        sent_tokens = tokenizer.encode(sent, add_special_tokens=False)
-        sent_token_count = len(sent_tokens)
-        
+        sent_token_count = token_counts[i]
+
         # If single sentence exceeds max, split it
         if sent_token_count > max_tokens:
-            if current_chunk:
+            if chunk_start < i:
                 chunks.append({
-                    'text': ' '.join(current_chunk),
-                    'sentence_indices': list(range(i - len(current_chunk), i))
+                    'text': ' '.join(sentences[chunk_start:i]),
+                    'sentence_indices': list(range(chunk_start, i))
                 })
-                current_chunk = []
-                current_tokens = 0
-            
+
             # Split long sentence into smaller parts
-            words = sent.split()
+            words, word_counts = _word_token_counts(sent, token_starts[i])
             temp_chunk = []
             temp_tokens = 0
-            
-            for word in words:
-                word_tokens = len(tokenizer.encode(word, add_special_tokens=False))
+
+            for word, word_tokens in zip(words, word_counts):
                 if temp_tokens + word_tokens > max_tokens:
                     if temp_chunk:
                         chunks.append({
@@ -44,36 +83,83 @@ def smart_chunk_by_sentences(text, max_tokens=384, overlap_sentences=2):
                 else:
                     temp_chunk.append(word)
                     temp_tokens += word_tokens
-            
+
             if temp_chunk:
                 chunks.append({
                     'text': ' '.join(temp_chunk),
                     'sentence_indices': [i]
                 })
+            chunk_start = i + 1
+            current_tokens = 0
             continue
-        
+
         # Check if adding this sentence exceeds limit
         if current_tokens + sent_token_count > max_tokens:
-            if current_chunk:
+            if chunk_start < i:
                 chunks.append({
-                    'text': ' '.join(current_chunk),
-                    'sentence_indices': list(range(i - len(current_chunk), i))
+                    'text': ' '.join(sentences[chunk_start:i]),
+                    'sentence_indices': list(range(chunk_start, i))
                 })
-            
-            # Start new chunk with overlap
-            overlap_start = max(0, len(current_chunk) - overlap_sentences)
-            current_chunk = current_chunk[overlap_start:] + [sent]
-            current_tokens = sum(len(tokenizer.encode(s, add_special_tokens=False)) 
-                               for s in current_chunk)
+
+            # Start new chunk with overlap, reusing the cached counts
+            chunk_start = max(chunk_start, i - overlap_sentences)
+            current_tokens = sum(token_counts[chunk_start:i + 1])
         else:
-            current_chunk.append(sent)
             current_tokens += sent_token_count
-    
+
     # Add remaining chunk
-    if current_chunk:
+    if chunk_start < len(sentences):
         chunks.append({
-            'text': ' '.join(current_chunk),
-            'sentence_indices': list(range(len(sentences) - len(current_chunk), len(sentences)))
+            'text': ' '.join(sentences[chunk_start:]),
+            'sentence_indices': list(range(chunk_start, len(sentences)))
         })
-    
+
+    return chunks
+
+def reuse_sentence_tokens(sentences, previous_sentences, previous_counts, previous_starts):
+    """
+    Token counts and offsets for sentences, copied from an earlier version
+    of the document wherever a run of sentences is unchanged; only the
+    inserted or edited sentences go through the tokenizer.
+    Returns (token_counts, token_starts, reused_count).
+    """
+    token_counts = [None] * len(sentences)
+    token_starts = [None] * len(sentences)
+    matcher = difflib.SequenceMatcher(None, previous_sentences, sentences, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            token_counts[j1:j2] = previous_counts[i1:i2]
+            token_starts[j1:j2] = previous_starts[i1:i2]
+
+    changed = [j for j, count in enumerate(token_counts) if count is None]
+    counts, starts = tokenize_sentences([sentences[j] for j in changed])
+    for j, count, sent_starts in zip(changed, counts, starts):
+        token_counts[j] = count
+        token_starts[j] = sent_starts
+    return token_counts, token_starts, len(sentences) - len(changed)
+
+def chunk_with_tokens(text, max_tokens=384, overlap_sentences=2, previous=None):
+    """
+    smart_chunk_by_sentences that also hands back the per-sentence token
+    data, for keeping as document state. previous, if given, is an earlier
+    version's (sentences, token_counts, token_starts); unchanged sentences
+    reuse its token data instead of being tokenized again.
+    Returns (chunks, sentences, token_counts, token_starts, reused_count).
+    """
+    ensure_nltk_data()
+    sentences = nltk.sent_tokenize(text)
+    if previous is None:
+        token_counts, token_starts = tokenize_sentences(sentences)
+        reused = 0
+    else:
+        token_counts, token_starts, reused = reuse_sentence_tokens(sentences, *previous)
+    chunks = chunk_sentences(sentences, token_counts, token_starts, max_tokens, overlap_sentences)
+    instrumentation.count("document_tokens", sum(token_counts))
+    instrumentation.count("sentences", len(sentences))
+    instrumentation.count("chunks", len(chunks))
+    return chunks, sentences, token_counts, token_starts, reused
+
+def smart_chunk_by_sentences(text, max_tokens=384, overlap_sentences=2):
+    """Chunk text by sentences to preserve semantic boundaries"""
+    chunks, sentences, _, _, _ = chunk_with_tokens(text, max_tokens, overlap_sentences)
     return chunks, sentences
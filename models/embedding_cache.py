@@ -0,0 +1,162 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Bounded in-memory tier, by entry count and by bytes: a [CLS] vector is
+# ~3 KB, a chunk-pool entry (1 + n_spans) x 769 floats, often 30-60 KB
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", 20000))
+EMBEDDING_CACHE_MAX_MB = float(os.environ.get("EMBEDDING_CACHE_MAX_MB", 512))
+# Optional SQLite file for the disk tier; disabled when unset
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_text(text):
+    """Collapse whitespace so re-extracted text maps to the same key"""
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+def cache_key(model_name, text):
+    """Content address of a text under a given model"""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache: an LRU dict in memory backed by an
+    optional SQLite table on disk. Keys are hashes of model name plus
+    normalized text, so any text seen before skips the model entirely.
+    """
+
+    def __init__(self, max_entries=EMBEDDING_CACHE_SIZE, path=EMBEDDING_CACHE_PATH,
+                 max_bytes=int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024)):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, shape TEXT NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    def _remember(self, key, vector):
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.nbytes
+        self._memory[key] = vector
+        self._memory_bytes += vector.nbytes
+        while self._memory and (len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    def _disk_get(self, key):
+        row = self._db.execute(
+            "SELECT shape, vector FROM embeddings WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        shape = tuple(int(d) for d in row[0].split(",") if d)
+        return np.frombuffer(row[1], dtype=np.float32).reshape(shape)
+
+    def get(self, model_name, text):
+        """Cached vector for text, or None"""
+        key = cache_key(model_name, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+            elif self._db is not None:
+                vector = self._disk_get(key)
+                if vector is not None:
+                    self.disk_hits += 1
+                    self._remember(key, vector)
+
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return vector
+
+    def put(self, model_name, text, vector):
+        self.put_many(model_name, [text], [vector])
+
+    def put_many(self, model_name, texts, vectors):
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = cache_key(model_name, text)
+                # A copy, so a cached row does not keep the caller's whole batch array alive
+                vector = np.array(vector, dtype=np.float32, copy=True)
+                self._remember(key, vector)
+                if self._db is not None:
+                    shape = ",".join(str(d) for d in vector.shape)
+                    rows.append((key, shape, vector.tobytes()))
+
+            if rows:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, shape, vector) VALUES (?, ?, ?)",
+                    rows
+                )
+                self._db.commit()
+
+    def get_or_compute(self, model_name, texts, encode_fn, stack=True):
+        """
+        Look up every text and call encode_fn(missing_texts) once for the
+        misses. Returns a stacked array in input order, or a list of
+        arrays when stack is False (for entries of differing shapes).
+        """
+        cached = [self.get(model_name, text) for text in texts]
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+
+        if missing:
+            computed = encode_fn([texts[i] for i in missing])
+            self.put_many(model_name, [texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                cached[i] = np.asarray(vector, dtype=np.float32)
+
+        if not stack:
+            return cached
+        if not cached:
+            return np.zeros((0,), dtype=np.float32)
+        return np.stack(cached)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "memory_mb": round(self._memory_bytes / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "disk_enabled": self._db is not None
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self.hits = self.misses = self.disk_hits = 0
+
+
+embedding_cache = EmbeddingCache()
@@ -1,45 +1,287 @@
 import torch
-from transformers import AutoModel, AutoTokenizer
 import numpy as np
+from models.embedding_cache import embedding_cache
+from models.keyphrase_matcher import as_matcher
+from models import instrumentation
+from models.registry import get_embedding_encoder, get_embedding_tokenizer, embedding_model_key
+from models.encoder_scheduler import EncoderScheduler, ENCODER_BATCHING
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-bert_model = AutoModel.from_pretrained("bert-base-uncased").to(device).eval()
-bert_tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased")
+EMBEDDING_BATCH_SIZE = 32
 
 def get_sentence_embedding(text):
     """Get BERT embedding for a sentence"""
+    return get_sentence_embeddings_batch([text])[0]
+
+def get_sentence_embeddings_batch(texts, batch_size=EMBEDDING_BATCH_SIZE, max_length=512):
+    """
+    Get BERT [CLS] embeddings for a list of texts in padded micro-batches.
+    Texts already in the embedding cache skip the model; the rest are
+    sorted by length so each batch pads to a similar size, and the results
+    are returned in the original input order.
+    """
+    if len(texts) == 0:
+        return np.zeros((0, get_embedding_encoder().hidden_size), dtype=np.float32)
+
+    return embedding_cache.get_or_compute(
+        f"{embedding_model_key()}:cls:{max_length}",
+        texts,
+        lambda missing: _encode_cls(missing, batch_size, max_length)
+    )
+
+def _run_encoder_batch(texts, max_length):
+    """
+    One padded forward pass. Returns, per text, its hidden states and
+    token offsets with the padding cut off.
+    """
+    encoder, bert_tokenizer = get_embedding_encoder(), get_embedding_tokenizer()
     inputs = bert_tokenizer(
-        text, 
-        return_tensors="pt", 
-        padding=True, 
-        truncation=True, 
-        max_length=512
-    ).to(device)
-    
+        texts,
+        return_tensors="pt",
+        padding=True,
+        truncation=True,
+        max_length=max_length,
+        return_offsets_mapping=True
+    )
+    offsets = inputs.pop("offset_mapping").numpy()
+    lengths = inputs["attention_mask"].sum(dim=1).tolist()
+    inputs = inputs.to(encoder.device)
+
     with torch.no_grad():
-        outputs = bert_model(**inputs)
-        # Use [CLS] token embedding
-        embedding = outputs.last_hidden_state[:, 0, :].squeeze()
-    
-    return embedding.cpu().numpy()
-
-def get_chunk_embeddings_batch(chunks, keyphrases):
-    """Get embeddings for chunks with keyphrase weighting"""
-    embeddings = []
-    
-    for chunk_info in chunks:
-        chunk_text = chunk_info['text']
-        
-        # Count keyphrases in chunk
-        kp_count = sum(1 for kp in keyphrases if kp.lower() in chunk_text.lower())
-        
-        # Get base embedding
-        emb = get_sentence_embedding(chunk_text)
-        
-        # Weight by keyphrase presence
-        weight = 1.0 + (kp_count * 0.5)
-        weighted_emb = emb * weight
-        
-        embeddings.append(weighted_emb)
-    
-    return np.array(embeddings)
+        hidden = encoder(inputs)
+
+    # BERT pads on the right, so each text's tokens are the first `length` rows
+    return [(hidden[row, :length], offsets[row, :length]) for row, length in enumerate(lengths)]
+
+# Shared by every pipeline thread in the process; None runs batches on the caller's thread
+encoder_scheduler = EncoderScheduler(_run_encoder_batch) if ENCODER_BATCHING else None
+
+def _encode_tokens(texts, batch_size, max_length):
+    """
+    (hidden_states, offsets) per text, in input order. Texts go to the
+    encoder longest first: padding stays low and an OOM shows up on the
+    first batch. With the scheduler, batches may also carry texts of
+    other requests and batch_size gives way to its max_batch.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    ordered = [texts[i] for i in order]
+
+    rows = []
+    if encoder_scheduler is not None:
+        futures = encoder_scheduler.submit(ordered, max_length)
+        batch_ids = set()
+        while len(rows) < len(futures):
+            # Wait for the next text, then take whatever else its batch finished
+            row, batch_id = futures[len(rows)].result()
+            rows.append(row)
+            batch_ids.add(batch_id)
+            while len(rows) < len(futures) and futures[len(rows)].done():
+                row, batch_id = futures[len(rows)].result()
+                rows.append(row)
+                batch_ids.add(batch_id)
+            instrumentation.progress("embeddings", len(rows), len(texts))
+        forward_passes = len(batch_ids)
+    else:
+        for start in range(0, len(ordered), batch_size):
+            rows.extend(_run_encoder_batch(ordered[start:start + batch_size], max_length))
+            instrumentation.progress("embeddings", len(rows), len(texts))
+        forward_passes = -(-len(ordered) // batch_size)
+
+    instrumentation.count("forward_passes", forward_passes)
+    instrumentation.count("encoded_texts", len(texts))
+    instrumentation.count("encoded_tokens", sum(len(offsets) for _, offsets in rows))
+
+    results = [None] * len(texts)
+    for i, row in zip(order, rows):
+        results[i] = row
+    return results
+
+def _encode_cls(texts, batch_size, max_length):
+    rows = _encode_tokens(texts, batch_size, max_length)
+    # Use [CLS] token embedding
+    return torch.stack([hidden[0] for hidden, _ in rows]).float().cpu().numpy()
+
+def _encode_mean(texts, batch_size, max_length):
+    # Each text is one span covering all of it; special tokens are left out
+    hidden_size = get_embedding_encoder().hidden_size
+    entries = _encode_pooled_chunks([(text, [(0, len(text))]) for text in texts], batch_size, max_length)
+    return np.stack([entry[1, :hidden_size] for entry in entries])
+
+def apply_keyphrase_weights(embeddings, chunks, keyphrases):
+    """
+    Scale each chunk embedding by the number of keyphrases it contains.
+    keyphrases may be a list or a KeyphraseMatcher built once for the document.
+    """
+    if len(chunks) == 0:
+        return embeddings
+
+    # Count keyphrases in every chunk in one matcher pass
+    kp_counts = as_matcher(keyphrases).counts([chunk_info['text'] for chunk_info in chunks])
+
+    # Weight by keyphrase presence
+    weights = 1.0 + (kp_counts * 0.5)
+    embeddings *= weights[:, None]
+
+    return embeddings
+
+def get_chunk_embeddings_batch(chunks, keyphrases=None):
+    """
+    Get embeddings for chunks with keyphrase weighting. Without keyphrases
+    the embeddings come back unweighted, for callers that weight them later.
+    """
+    chunk_texts = [chunk_info['text'] for chunk_info in chunks]
+
+    # Get base embeddings for all chunks in one batched pass
+    embeddings = get_sentence_embeddings_batch(chunk_texts)
+
+    if keyphrases is None:
+        return embeddings
+    return apply_keyphrase_weights(embeddings, chunks, keyphrases)
+
+def _sentence_spans(chunk_info, sentences):
+    """
+    Character spans of each sentence inside a chunk's text, as
+    (sentence_index, start, end) tuples. Pieces of an oversized sentence
+    map their whole text to that sentence.
+    """
+    indices = chunk_info['sentence_indices']
+    chunk_text = chunk_info['text']
+
+    if len(indices) == 1 and chunk_text != sentences[indices[0]]:
+        return [(indices[0], 0, len(chunk_text))]
+
+    spans = []
+    start = 0
+    for idx in indices:
+        end = start + len(sentences[idx])
+        spans.append((idx, start, end))
+        start = end + 1  # chunks join sentences with a single space
+    return spans
+
+def _encode_pooled_chunks(items, batch_size, max_length):
+    """
+    Encode (chunk_text, spans) items and mean-pool each span's tokens.
+    Each result is a (1 + n_spans, hidden + 1) array: row 0 holds the [CLS]
+    vector, the other rows hold span means with their token count in the
+    last column.
+    """
+    hidden_size = get_embedding_encoder().hidden_size
+    rows = _encode_tokens([text for text, _ in items], batch_size, max_length)
+    results = []
+
+    for (_, spans), (hidden, offsets) in zip(items, rows):
+        span_starts = np.array([s[0] for s in spans])
+        span_ends = np.array([s[1] for s in spans])
+
+        # Token -> span assignment; special tokens have empty offsets
+        tok_starts = offsets[:, 0]
+        tok_ends = offsets[:, 1]
+        pos = np.searchsorted(span_starts, tok_starts, side="right") - 1
+        valid = (tok_ends > tok_starts) & (pos >= 0)
+        pos = np.clip(pos, 0, None)
+        valid &= tok_ends <= span_ends[pos]
+
+        token_spans = pos[valid]
+        sums = torch.zeros((len(spans), hidden_size), device=hidden.device)
+        sums.index_add_(
+            0,
+            torch.from_numpy(token_spans).to(hidden.device),
+            hidden[torch.from_numpy(np.nonzero(valid)[0]).to(hidden.device)].float()
+        )
+        counts = np.bincount(token_spans, minlength=len(spans))
+
+        entry = np.zeros((1 + len(spans), hidden_size + 1), dtype=np.float32)
+        entry[0, :hidden_size] = hidden[0].float().cpu().numpy()
+        entry[1:, :hidden_size] = sums.cpu().numpy() / np.maximum(counts, 1)[:, None]
+        entry[1:, hidden_size] = counts
+        results.append(entry)
+
+    return results
+
+def get_chunk_and_sentence_embeddings(chunks, sentences, keyphrases=None,
+                                      batch_size=EMBEDDING_BATCH_SIZE, max_length=512):
+    """
+    Single-pass embeddings: run BERT once per chunk and mean-pool each
+    sentence's token span (found through the tokenizer's offset mapping)
+    into a sentence vector. Sentences covered by several overlapping chunks
+    average their pooled vectors. Returns (chunk_embeddings, sentence_embeddings),
+    with chunk embeddings keyphrase-weighted like get_chunk_embeddings_batch
+    (unweighted when keyphrases is None).
+    """
+    (chunk_embeddings, sentence_embeddings), = get_documents_chunk_and_sentence_embeddings(
+        [(chunks, sentences)], batch_size=batch_size, max_length=max_length
+    )
+    if keyphrases is not None:
+        chunk_embeddings = apply_keyphrase_weights(chunk_embeddings, chunks, keyphrases)
+    return chunk_embeddings, sentence_embeddings
+
+def get_documents_chunk_and_sentence_embeddings(documents, batch_size=EMBEDDING_BATCH_SIZE, max_length=512):
+    """
+    get_chunk_and_sentence_embeddings for several (chunks, sentences)
+    documents at once. Chunks of all documents share the encoder batches,
+    so short documents no longer run half-empty batches of their own.
+    Returns one unweighted (chunk_embeddings, sentence_embeddings) pair
+    per document.
+    """
+    hidden_size = get_embedding_encoder().hidden_size
+    document_spans = [
+        [_sentence_spans(chunk_info, sentences) for chunk_info in chunks]
+        for chunks, sentences in documents
+    ]
+
+    # Cache per chunk: the key carries the span layout as well as the text
+    cache_texts = []
+    items = {}
+    for (chunks, _), chunk_spans in zip(documents, document_spans):
+        for chunk_info, spans in zip(chunks, chunk_spans):
+            cache_text = chunk_info['text'] + "\0" + ",".join(f"{s}:{e}" for _, s, e in spans)
+            cache_texts.append(cache_text)
+            items[cache_text] = (chunk_info['text'], [(s, e) for _, s, e in spans])
+    pooled = embedding_cache.get_or_compute(
+        f"{embedding_model_key()}:chunk-pool:{max_length}",
+        cache_texts,
+        lambda missing: _encode_pooled_chunks([items[t] for t in missing], batch_size, max_length),
+        stack=False
+    )
+
+    results = []
+    missing_sentences = []
+    offset = 0
+    for (chunks, sentences), chunk_spans in zip(documents, document_spans):
+        chunk_embeddings = np.zeros((len(chunks), hidden_size), dtype=np.float32)
+        sentence_sums = np.zeros((len(sentences), hidden_size), dtype=np.float32)
+        sentence_counts = np.zeros(len(sentences), dtype=np.float32)
+
+        for chunk_idx, (entry, spans) in enumerate(zip(pooled[offset:offset + len(chunks)], chunk_spans)):
+            chunk_embeddings[chunk_idx] = entry[0, :hidden_size]
+            span_ids = [sent_idx for sent_idx, _, _ in spans]
+            counts = entry[1:, hidden_size]
+            np.add.at(sentence_sums, span_ids, entry[1:, :hidden_size] * counts[:, None])
+            np.add.at(sentence_counts, span_ids, counts)
+        offset += len(chunks)
+
+        sentence_embeddings = sentence_sums / np.maximum(sentence_counts, 1)[:, None]
+        # Sentences lost to chunk truncation get a standalone, mean-pooled encoding
+        missing = np.nonzero(sentence_counts == 0)[0].tolist()
+        missing_sentences.append(missing)
+        results.append((chunk_embeddings, sentence_embeddings))
+
+    # One encoder call covers the stragglers of every document
+    straggler_texts = [
+        sentences[i]
+        for (_, sentences), missing in zip(documents, missing_sentences)
+        for i in missing
+    ]
+    if straggler_texts:
+        # Mean-pooled like the rest, so MMR compares vectors from one space
+        stragglers = embedding_cache.get_or_compute(
+            f"{embedding_model_key()}:mean:{max_length}",
+            straggler_texts,
+            lambda missing: _encode_mean(missing, batch_size, max_length)
+        )
+        offset = 0
+        for (_, sentence_embeddings), missing in zip(results, missing_sentences):
+            if missing:
+                sentence_embeddings[missing] = stragglers[offset:offset + len(missing)]
+                offset += len(missing)
+
+    return results
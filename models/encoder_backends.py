@@ -0,0 +1,173 @@
+"""
+Inference backends for the embedding encoder. Every backend is called
+with the tokenizer's output and returns the last hidden state as a
+torch tensor, so the pooling code does not care which one runs.
+
+- "torch": the eager fp32 model on the registry device (GPU if available)
+- "torch-int8": torch dynamic quantization of the Linear layers, CPU only
+- "onnx": ONNX Runtime on CPU, running a graph exported once from the same
+  checkpoint and kept under ENCODER_ONNX_DIR. Needs the optional packages
+  that requirements.txt leaves out: pip install onnx onnxruntime
+
+ENCODER_THREADS caps the intra-op threads of torch and ONNX Runtime. Set
+it to cores / workers when several pipeline workers share a node so they
+do not oversubscribe the CPU.
+"""
+import os
+
+ENCODER_BACKENDS = ("torch", "torch-int8", "onnx")
+ENCODER_BACKEND = os.environ.get("PDFSUM_ENCODER_BACKEND", "torch")
+ENCODER_THREADS = int(os.environ.get("PDFSUM_ENCODER_THREADS", 0))  # 0 = library default
+ENCODER_ONNX_DIR = os.environ.get(
+    "PDFSUM_ONNX_DIR", os.path.join(os.path.expanduser("~"), ".cache", "pdfsum", "onnx")
+)
+ONNX_OPSET = 17
+
+
+def apply_thread_limit(threads=ENCODER_THREADS):
+    """Cap torch's intra-op thread pool (process-wide); 0 leaves the default"""
+    if threads > 0:
+        import torch
+        torch.set_num_threads(threads)
+
+
+class TorchEncoder:
+    """Eager PyTorch model, fp32 or dynamically quantized"""
+
+    def __init__(self, model, device, name="torch"):
+        self.model = model
+        self.device = device
+        self.name = name
+        self.hidden_size = model.config.hidden_size
+
+    def __call__(self, inputs):
+        return self.model(**inputs).last_hidden_state
+
+    def footprint(self):
+        """Parameter count and tensor bytes; int8 layers keep theirs in packed params"""
+        if not hasattr(self, "_footprint"):
+            import torch
+
+            def tensors(value):
+                if isinstance(value, torch.Tensor):
+                    yield value
+                elif isinstance(value, (tuple, list)):
+                    for item in value:
+                        yield from tensors(item)
+
+            state = list(tensors(list(self.model.state_dict().values())))
+            self._footprint = {
+                "backend": self.name,
+                "parameters": sum(t.numel() for t in state),
+                "size_mb": round(sum(t.numel() * t.element_size() for t in state) / 2**20, 1)
+            }
+        return self._footprint
+
+
+def quantize_dynamic_int8(model):
+    """int8 weights for every nn.Linear, activations quantized on the fly; CPU only"""
+    import torch
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _last_hidden_state_module(model, input_names):
+    """Wrap the encoder so the exported graph takes positional inputs and has one output"""
+    import torch
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *args):
+            return self.model(**dict(zip(input_names, args))).last_hidden_state
+
+    return LastHiddenState()
+
+
+def onnx_path(name, directory=ENCODER_ONNX_DIR):
+    return os.path.join(directory, name.replace("/", "__") + ".onnx")
+
+
+def export_onnx(model, tokenizer, path, opset=ONNX_OPSET):
+    """Export the encoder to ONNX with dynamic batch and sequence axes"""
+    import torch
+
+    input_names = list(tokenizer.model_input_names)
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    wrapper = _last_hidden_state_module(model, input_names)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            tuple(sample[name] for name in input_names),
+            tmp_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            dynamo=False
+        )
+    # Rename last so a half-written export is never picked up
+    os.replace(tmp_path, path)
+    return path
+
+
+class OnnxEncoder:
+    """ONNX Runtime session over an exported encoder graph"""
+
+    def __init__(self, path, hidden_size, threads=ENCODER_THREADS):
+        import onnxruntime as ort
+        import torch
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.path = path
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.device = torch.device("cpu")
+        self.name = "onnx"
+        self.hidden_size = hidden_size
+
+    def footprint(self):
+        """Size of the exported graph, which the session holds in memory"""
+        return {"backend": self.name, "size_mb": round(os.path.getsize(self.path) / 2**20, 1)}
+
+    def __call__(self, inputs):
+        import torch
+        feed = {name: inputs[name].cpu().numpy() for name in self.input_names}
+        (hidden,) = self.session.run(["last_hidden_state"], feed)
+        return torch.from_numpy(hidden)
+
+
+def load_encoder(backend, name, tokenizer, device, load_model, load_cpu_model, load_config):
+    """
+    Build the encoder for a backend. load_model() returns the shared fp32
+    model on device; load_cpu_model() returns a private fp32 CPU copy,
+    which int8 quantizes and ONNX exports, and which is dropped afterwards.
+    An existing ONNX export is reused without loading torch weights; it is
+    keyed by checkpoint name, so delete it after changing the checkpoint.
+    """
+    import torch
+
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend: {backend}")
+    apply_thread_limit()
+
+    if backend == "torch":
+        return TorchEncoder(load_model(), device)
+    if backend == "torch-int8":
+        return TorchEncoder(quantize_dynamic_int8(load_cpu_model()), torch.device("cpu"), name=backend)
+
+    path = onnx_path(name)
+    if not os.path.exists(path):
+        print(f"   Exporting {name} to ONNX at {path}")
+        export_onnx(load_cpu_model(), tokenizer, path)
+    return OnnxEncoder(path, load_config().hidden_size)
@@ -0,0 +1,130 @@
+"""
+Dynamic batching in front of the embedding encoder.
+
+Pipelines running on different threads each hand their texts to one
+EncoderScheduler instead of calling the encoder themselves. A worker
+thread runs queued texts as one padded batch once it has max_batch texts
+or the oldest text has waited max_wait_ms. A batch is the oldest text
+plus the longest texts among the oldest few batches' worth, so lengths
+stay close, little of each batch is padding, and no text starves. Each
+caller blocks on futures for its own texts, so small requests from
+concurrent uploads share forward passes instead of each running a
+half-empty batch.
+
+Texts with different max_length never share a batch.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+ENCODER_BATCHING = os.environ.get("PDFSUM_ENCODER_BATCHING", "1") == "1"
+ENCODER_MAX_BATCH = int(os.environ.get("PDFSUM_ENCODER_MAX_BATCH", 32))
+ENCODER_MAX_WAIT_MS = float(os.environ.get("PDFSUM_ENCODER_MAX_WAIT_MS", 2))
+# Batches are cut from the oldest max_batch * LOOKAHEAD_BATCHES queued texts
+LOOKAHEAD_BATCHES = 4
+
+
+class EncoderScheduler:
+    """
+    Queue plus worker thread around run_batch(texts, max_length), which
+    must return one result per text. Each future of submit() resolves to
+    (result, batch_id); batch_id says which forward pass served the text.
+    """
+
+    def __init__(self, run_batch, max_batch=ENCODER_MAX_BATCH, max_wait_ms=ENCODER_MAX_WAIT_MS):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = deque()  # (text, max_length, future, enqueued_at)
+        self._condition = threading.Condition()
+        self._worker = None
+
+        self.batches = 0
+        self.sequences = 0
+        self.full_batches = 0
+        self.wait_seconds = 0.0
+        self.max_queue_depth = 0
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="encoder-scheduler", daemon=True)
+            self._worker.start()
+
+    def submit(self, texts, max_length):
+        """Queue texts; returns one Future per text"""
+        futures = [Future() for _ in texts]
+        now = time.perf_counter()
+        with self._condition:
+            self._ensure_worker()
+            self._queue.extend((text, max_length, future, now) for text, future in zip(texts, futures))
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            self._condition.notify()
+        return futures
+
+    def _next_batch(self):
+        """Block until a batch is due, then pop it"""
+        with self._condition:
+            while True:
+                if self._queue:
+                    waited = time.perf_counter() - self._queue[0][3]
+                    if len(self._queue) >= self.max_batch or waited >= self.max_wait:
+                        break
+                    self._condition.wait(self.max_wait - waited)
+                else:
+                    self._condition.wait()
+
+            max_length = self._queue[0][1]
+            window = []
+            # Oldest texts first, skipping texts with another max_length
+            for item in self._queue:
+                if len(window) == self.max_batch * LOOKAHEAD_BATCHES:
+                    break
+                if item[1] == max_length:
+                    window.append(item)
+            # The oldest text always goes in, so every text is served within
+            # a bounded number of batches however many longer ones arrive.
+            # The rest are the longest of the window, so short texts are not
+            # padded to long ones.
+            oldest = window.pop(0)
+            window.sort(key=lambda item: len(item[0]), reverse=True)
+            batch = [oldest] + window[:self.max_batch - 1]
+            for item in batch:
+                self._queue.remove(item)
+            return batch, max_length
+
+    def _run(self):
+        while True:
+            batch, max_length = self._next_batch()
+            started = time.perf_counter()
+            with self._condition:
+                self.batches += 1
+                batch_id = self.batches
+                self.sequences += len(batch)
+                self.full_batches += len(batch) == self.max_batch
+                self.wait_seconds += sum(started - enqueued_at for _, _, _, enqueued_at in batch)
+
+            try:
+                results = self.run_batch([text for text, _, _, _ in batch], max_length)
+            except BaseException as e:
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, _, future, _), result in zip(batch, results):
+                future.set_result((result, batch_id))
+
+    def stats(self):
+        with self._condition:
+            return {
+                "enabled": True,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_queue_depth,
+                "batches": self.batches,
+                "sequences": self.sequences,
+                "full_batches": self.full_batches,
+                "mean_batch_fill": round(self.sequences / (self.batches * self.max_batch), 4) if self.batches else 0.0,
+                "mean_wait_ms": round(self.wait_seconds / self.sequences * 1000, 3) if self.sequences else 0.0
+            }
@@ -0,0 +1,307 @@
+"""
+Pipeline instrumentation: per-request stage timings and work counters,
+process-wide totals rendered as Prometheus text, and optional profiling.
+
+A request opens a run with `pipeline_run()`. Code anywhere below it calls
+`stage_timer(name)` around a stage, `count(name, n)` for work done and
+`progress(stage, done, total)` for progress within a long stage. All
+three find the run through a context variable and do nothing outside
+one. Stage threads started by stage_graph copy the caller's context, so
+they record into the same run.
+
+Profiling is off unless PIPELINE_PROFILE_DIR is set. Each stage is then
+profiled on the thread it runs on. With pyinstrument installed every stage
+writes an HTML report; otherwise the stages' cProfile stats are merged into
+one .prof file per run (open with `python -m pstats` or snakeviz).
+
+With the process executor, each worker process keeps its own totals, so
+/metrics only covers runs made in the API process.
+"""
+import contextvars
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PIPELINE_PROFILE_DIR = os.environ.get("PIPELINE_PROFILE_DIR")
+
+# Upper bounds (seconds) of the latency histogram buckets
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+COUNTERS = {
+    "forward_passes": "Encoder forward passes (one per batch)",
+    "encoded_texts": "Texts sent through an encoder",
+    "encoded_tokens": "Non-padding tokens sent through the embedding encoder",
+    "document_tokens": "Embedding-tokenizer tokens in the chunked documents",
+    "sentences": "Sentences produced by chunking",
+    "chunks": "Chunks produced by chunking",
+}
+
+_current_run = contextvars.ContextVar("pipeline_run", default=None)
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in bytes on macOS, KiB elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 1024, 1)
+
+
+class RunMetrics:
+    """Timings and counters of one pipeline run; safe to update from several threads"""
+
+    def __init__(self, profile_dir=None, progress_callback=None):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.stages = {}
+        self.counters = {name: 0 for name in COUNTERS}
+        self.profile_dir = profile_dir
+        self.profiles = []
+        self.progress_callback = progress_callback
+        self.started = time.perf_counter()
+        self.total_seconds = None
+        # High-water mark of the whole process when the run ended, not of this run alone
+        self.process_peak_rss_mb = None
+        self.cuda_peak_mb = None
+        self._lock = threading.Lock()
+
+    def add(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record_stage(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = round(seconds, 3)
+
+    def timings(self):
+        timings = dict(self.stages)
+        if self.total_seconds is not None:
+            timings["total"] = round(self.total_seconds, 3)
+        return timings
+
+    def as_dict(self):
+        return {
+            "run_id": self.run_id,
+            "timings": self.timings(),
+            "counters": dict(self.counters),
+            "process_peak_rss_mb": self.process_peak_rss_mb,
+            "cuda_peak_mb": self.cuda_peak_mb,
+            "profiles": list(self.profiles)
+        }
+
+
+class MetricsRegistry:
+    """Process-wide totals across runs, rendered in the Prometheus text format"""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.runs = {"ok": 0, "error": 0}
+        self.counters = {name: 0 for name in COUNTERS}
+        self.histograms = {}  # (metric, stage) -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def _observe(self, metric, label, seconds):
+        key = (metric, label)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+    def observe_run(self, run, ok):
+        with self._lock:
+            self.runs["ok" if ok else "error"] += 1
+            for name, value in run.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for stage, seconds in run.stages.items():
+                self._observe("pdfsum_stage_duration_seconds", stage, seconds)
+            if run.total_seconds is not None:
+                self._observe("pdfsum_pipeline_duration_seconds", None, run.total_seconds)
+
+    def render(self, gauges=None, counters=None):
+        """
+        Prometheus text exposition. gauges is an optional
+        {metric_name: (help, value)} mapping of extra point-in-time values,
+        counters the same for values that only grow since start; their
+        names get a _total suffix.
+        """
+        lines = [
+            "# HELP pdfsum_pipeline_runs_total Pipeline runs by outcome",
+            "# TYPE pdfsum_pipeline_runs_total counter"
+        ]
+        with self._lock:
+            for status, value in self.runs.items():
+                lines.append(f'pdfsum_pipeline_runs_total{{status="{status}"}} {value}')
+
+            for name, value in self.counters.items():
+                metric = f"pdfsum_{name}_total"
+                lines.append(f"# HELP {metric} {COUNTERS.get(name, name)}")
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+
+            for metric in ("pdfsum_stage_duration_seconds", "pdfsum_pipeline_duration_seconds"):
+                lines.append(f"# HELP {metric} Wall-clock duration")
+                lines.append(f"# TYPE {metric} histogram")
+                for (name, label), histogram in sorted(self.histograms.items(), key=lambda kv: str(kv[0])):
+                    if name != metric:
+                        continue
+                    labels = f'stage="{label}",' if label is not None else ""
+                    for bound, value in zip(self.buckets, histogram):
+                        lines.append(f'{metric}_bucket{{{labels}le="{bound}"}} {value}')
+                    lines.append(f'{metric}_bucket{{{labels}le="+Inf"}} {histogram[-1]}')
+                    labels = f'{{stage="{label}"}}' if label is not None else ""
+                    lines.append(f"{metric}_sum{labels} {histogram[-2]:.6f}")
+                    lines.append(f"{metric}_count{labels} {histogram[-1]}")
+
+        for metric, (help_text, value) in (counters or {}).items():
+            lines.append(f"# HELP {metric}_total {help_text}")
+            lines.append(f"# TYPE {metric}_total counter")
+            lines.append(f"{metric}_total {value}")
+
+        gauges = {"pdfsum_process_peak_rss_mb": ("Peak resident set size of this process", _peak_rss_mb()),
+                  **(gauges or {})}
+        for metric, (help_text, value) in gauges.items():
+            if value is None:
+                continue
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+
+def current_run():
+    return _current_run.get()
+
+
+def count(name, n=1):
+    """Add n to a counter of the current run, if there is one"""
+    run = _current_run.get()
+    if run is not None:
+        run.add(name, n)
+
+
+def progress(stage, done, total):
+    """Tell the current run's progress_callback how far a stage has got"""
+    run = _current_run.get()
+    if run is not None and run.progress_callback is not None:
+        run.progress_callback(stage, done, total)
+
+
+def _cuda_available():
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except ImportError:
+        return False
+
+
+@contextmanager
+def pipeline_run(profile_dir=PIPELINE_PROFILE_DIR, progress_callback=None):
+    """
+    Collect metrics for everything run inside the block. Yields the
+    RunMetrics, which is complete (total time, peak memory, profile
+    paths) once the block exits. progress_callback, if given, receives
+    progress(stage, done, total) calls made inside the block.
+    """
+    run = RunMetrics(profile_dir=profile_dir, progress_callback=progress_callback)
+    token = _current_run.set(run)
+    cuda = _cuda_available()
+    if cuda:
+        import torch
+        # Process-wide; overlapping runs on one GPU share the peak
+        torch.cuda.reset_peak_memory_stats()
+
+    ok = False
+    try:
+        yield run
+        ok = True
+    finally:
+        _current_run.reset(token)
+        run.total_seconds = time.perf_counter() - run.started
+        run.process_peak_rss_mb = _peak_rss_mb()
+        if cuda:
+            run.cuda_peak_mb = round(torch.cuda.max_memory_allocated() / 2**20, 1)
+        if profile_dir:
+            _merge_cprofile(run)
+        metrics_registry.observe_run(run, ok)
+
+
+@contextmanager
+def stage_timer(stage):
+    """Time a stage of the current run, profiling it when the run profiles"""
+    run = _current_run.get()
+    if run is None:
+        yield
+        return
+
+    profiler = _start_profiler() if run.profile_dir else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.record_stage(stage, time.perf_counter() - start)
+        if profiler is not None:
+            _stop_profiler(run, stage, profiler)
+
+
+def _start_profiler():
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one active cProfile per process; the
+            # concurrent stage is already covered by the running one
+            return None
+        return profiler
+
+    profiler = Profiler()
+    profiler.start()
+    return profiler
+
+
+def _stop_profiler(run, stage, profiler):
+    os.makedirs(run.profile_dir, exist_ok=True)
+    if hasattr(profiler, "output_html"):
+        profiler.stop()
+        path = os.path.join(run.profile_dir, f"{run.run_id}-{stage}.html")
+        with open(path, "w") as f:
+            f.write(profiler.output_html())
+        with run._lock:
+            run.profiles.append(path)
+    else:
+        profiler.disable()
+        with run._lock:
+            run.profiles.append(profiler)
+
+
+def _merge_cprofile(run):
+    """Fold the stages' cProfile stats into one file per run"""
+    import pstats
+
+    profilers = [p for p in run.profiles if not isinstance(p, str)]
+    run.profiles = [p for p in run.profiles if isinstance(p, str)]
+    if not profilers:
+        return
+    stats = pstats.Stats(profilers[0])
+    for profiler in profilers[1:]:
+        stats.add(profiler)
+    path = os.path.join(run.profile_dir, f"{run.run_id}.prof")
+    stats.dump_stats(path)
+    run.profiles.append(path)
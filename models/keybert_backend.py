@@ -0,0 +1,36 @@
+import math
+from keybert.backend import BaseEmbedder
+from models.embedding_cache import embedding_cache
+from models import instrumentation
+
+# SentenceTransformer.encode's default batch size, made explicit so passes can be counted
+ENCODE_BATCH_SIZE = 32
+
+
+class CachedSentenceTransformerBackend(BaseEmbedder):
+    """KeyBERT backend that serves document and candidate embeddings from the embedding cache"""
+
+    def __init__(self, model, model_name):
+        super().__init__()
+        self.embedding_model = model
+        self.model_name = model_name
+
+    def embed(self, documents, verbose=False):
+        return embedding_cache.get_or_compute(
+            self.model_name,
+            list(documents),
+            lambda missing: self._encode(missing, verbose)
+        )
+
+    def _encode(self, texts, verbose):
+        instrumentation.count("forward_passes", math.ceil(len(texts) / ENCODE_BATCH_SIZE))
+        instrumentation.count("encoded_texts", len(texts))
+        return self.embedding_model.encode(texts, batch_size=ENCODE_BATCH_SIZE, show_progress_bar=verbose)
+
+
+class SharedEncoderBackend(BaseEmbedder):
+    """KeyBERT backend reusing the embedding-stage encoder, so one model serves both stages"""
+
+    def embed(self, documents, verbose=False):
+        from models.embeddings import get_sentence_embeddings_batch
+        return get_sentence_embeddings_batch(list(documents))
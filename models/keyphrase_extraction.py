@@ -1,43 +1,126 @@
-from keybert import KeyBERT
-from sentence_transformers import SentenceTransformer
+from models.registry import get_keybert
+from collections import Counter
+import math
+import os
 import re
 
-sbert = SentenceTransformer("all-MiniLM-L6-v2")
-kw_model = KeyBERT(model=sbert)
+KEYPHRASE_NGRAM_RANGE = (1, 4)
+
+# "fast" ranks candidate n-grams with a RAKE-style score and lets KeyBERT
+# embed only the best KEYPHRASE_MAX_CANDIDATES; "full" embeds every n-gram
+KEYPHRASE_MODES = ("fast", "full")
+KEYPHRASE_MODE = os.environ.get("KEYPHRASE_MODE", "fast")
+KEYPHRASE_MAX_CANDIDATES = int(os.environ.get("KEYPHRASE_MAX_CANDIDATES", 300))
+
+_PHRASE_DELIMITER_RE = re.compile(r'[^\w\s]+')
+_TOKEN_RE = re.compile(r'(?u)\b\w\w+\b')
+
+_analyzer = None
+
+def _candidate_analyzer():
+    """The n-gram analyzer KeyBERT's CountVectorizer uses, so candidates match its vocabulary"""
+    global _analyzer
+    if _analyzer is None:
+        from sklearn.feature_extraction.text import CountVectorizer
+        _analyzer = CountVectorizer(
+            ngram_range=KEYPHRASE_NGRAM_RANGE, stop_words="english"
+        ).build_analyzer()
+    return _analyzer
+
+def _rake_word_scores(doc_lower):
+    """
+    RAKE word scores (degree / frequency): the text is cut into runs of
+    content words at stop words and punctuation, and words that sit in
+    long runs score higher than words that mostly stand alone.
+    """
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+    frequency = Counter()
+    degree = Counter()
+    for fragment in _PHRASE_DELIMITER_RE.split(doc_lower):
+        run = []
+        for token in _TOKEN_RE.findall(fragment) + [None]:
+            if token is None or token in ENGLISH_STOP_WORDS:
+                for word in run:
+                    frequency[word] += 1
+                    degree[word] += len(run)
+                run = []
+            else:
+                run.append(token)
+    return {word: degree[word] / frequency[word] for word in frequency}
+
+def rank_candidates(doc_text, max_candidates=KEYPHRASE_MAX_CANDIDATES):
+    """
+    Cheap candidate prefilter: enumerate the same 1-4 gram candidates as
+    KeyBERT, score each by the sum of its RAKE word scores times
+    1 + log(occurrences), and keep the best max_candidates.
+    """
+    ngram_counts = Counter(_candidate_analyzer()(doc_text))
+    if len(ngram_counts) <= max_candidates:
+        return list(ngram_counts)
+
+    word_scores = _rake_word_scores(doc_text.lower())
+
+    def score(item):
+        phrase, count = item
+        return sum(word_scores.get(word, 0.0) for word in phrase.split()) * (1 + math.log(count))
+
+    ranked = sorted(ngram_counts.items(), key=score, reverse=True)
+    return [phrase for phrase, _ in ranked[:max_candidates]]
+
+def extract_keyphrases(doc_text, top_n=25, use_mmr=True, mode=KEYPHRASE_MODE):
+    """
+    Extract keyphrases with filtering for quality
+
+    mode:
+    - "fast": embed only the top-ranked candidate n-grams (see rank_candidates)
+    - "full": embed every candidate n-gram of the document
+
+    The document and candidate embeddings go through the embedding cache
+    (see keybert_backend), so a document embedded before, by an earlier
+    request or by the other mode, is not encoded again.
+    """
+    if mode not in KEYPHRASE_MODES:
+        raise ValueError(f"Unknown keyphrase mode: {mode}")
+
+    candidate_phrases = None
+    if mode == "fast":
+        candidate_phrases = rank_candidates(doc_text)
+        if not candidate_phrases:
+            return []
 
-def extract_keyphrases(doc_text, top_n=25, use_mmr=True):
-    """Extract keyphrases with filtering for quality"""
     # Extract candidates
-    candidates = kw_model.extract_keywords(
+    candidates = get_keybert().extract_keywords(
         doc_text,
-        keyphrase_ngram_range=(1, 4),
+        candidates=candidate_phrases,
+        keyphrase_ngram_range=KEYPHRASE_NGRAM_RANGE,
         stop_words="english",
         top_n=top_n * 2,  # Get more to filter
         use_mmr=use_mmr,
         diversity=0.6,
         nr_candidates=50
     )
-    
+
     # Filter low-quality keyphrases
     filtered = []
     for phrase, score in candidates:
         phrase = phrase.strip()
-        
+
         # Skip if too short or too long
         if len(phrase) < 3 or len(phrase) > 50:
             continue
-        
+
         # Skip if mostly numbers
         if sum(c.isdigit() for c in phrase) > len(phrase) * 0.5:
             continue
-        
+
         # Skip common academic stopwords
         if phrase.lower() in ['et al', 'fig', 'figure', 'table', 'section']:
             continue
-        
+
         filtered.append(phrase)
-        
+
         if len(filtered) >= top_n:
             break
-    
-    return filtered
\ No newline at end of file
+
+    return filtered
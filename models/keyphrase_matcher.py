@@ -0,0 +1,128 @@
+from bisect import bisect_right
+import numpy as np
+import re
+
+_WORD_RE = re.compile(r'\w+')
+
+class KeyphraseMatcher:
+    """
+    Case-insensitive matcher for a fixed set of keyphrases, built once per
+    document and reused for every chunk and sentence.
+
+    Two modes:
+    - substring (default): a keyphrase matches anywhere inside the text,
+      the same as `kp.lower() in text.lower()`. Each pattern is located
+      with C-level str.find over the text.
+    - word_boundary: a keyphrase matches only as a whole sequence of words,
+      so "model" does not match "models". Texts are scanned once, word by
+      word, against a table of keyphrase word n-grams.
+
+    A keyphrase listed twice counts twice, as the per-keyphrase loops did.
+    """
+
+    def __init__(self, keyphrases, word_boundary=False):
+        self.keyphrases = list(keyphrases)
+        self.word_boundary = word_boundary
+        self.patterns = [kp.lower() for kp in self.keyphrases]
+
+        # word_boundary mode: word tuple -> indices of the keyphrases it spells
+        self._ngrams = {}
+        for idx, pattern in enumerate(self.patterns):
+            words = tuple(_WORD_RE.findall(pattern))
+            if words:
+                self._ngrams.setdefault(words, []).append(idx)
+        self._max_words = max((len(words) for words in self._ngrams), default=0)
+
+    def __len__(self):
+        return len(self.keyphrases)
+
+    def _word_matches(self, text_lower):
+        """(start, end, keyphrase index) for every whole-word match, in text order"""
+        spans = [(m.start(), m.end(), m.group()) for m in _WORD_RE.finditer(text_lower)]
+        words = [word for _, _, word in spans]
+        matches = []
+        for i in range(len(words)):
+            for n in range(1, min(self._max_words, len(words) - i) + 1):
+                for idx in self._ngrams.get(tuple(words[i:i + n]), ()):
+                    matches.append((spans[i][0], spans[i + n - 1][1], idx))
+        return matches
+
+    def count(self, text):
+        """Number of keyphrases that occur in the text"""
+        text_lower = text.lower()
+        if self.word_boundary:
+            return len({idx for _, _, idx in self._word_matches(text_lower)})
+        return sum(pattern in text_lower for pattern in self.patterns)
+
+    def counts(self, texts):
+        """
+        count() for many texts at once, as a float array. In substring mode
+        every pattern is searched once over all the texts joined together,
+        and hits are mapped back to their text by offset.
+        """
+        texts_lower = [text.lower() for text in texts]
+        counts = np.zeros(len(texts_lower))
+        if not texts_lower or not self.patterns:
+            return counts
+
+        if self.word_boundary:
+            for i, text_lower in enumerate(texts_lower):
+                counts[i] = len({idx for _, _, idx in self._word_matches(text_lower)})
+            return counts
+
+        starts = []
+        ends = []
+        offset = 0
+        for text_lower in texts_lower:
+            starts.append(offset)
+            offset += len(text_lower)
+            ends.append(offset)
+            offset += 1
+        document = '\x00'.join(texts_lower)
+
+        for pattern in self.patterns:
+            if not pattern or '\x00' in pattern:
+                counts += [pattern in text_lower for text_lower in texts_lower]
+                continue
+
+            pos = document.find(pattern)
+            while pos != -1:
+                i = bisect_right(starts, pos) - 1
+                counts[i] += 1
+                # One hit per text is enough; resume after this text
+                pos = document.find(pattern, ends[i] + 1)
+        return counts
+
+    def positions(self, text):
+        """
+        Every match as (start, end, keyphrase), sorted by position, with
+        offsets into text itself. Substring matches may overlap each other.
+        """
+        text_lower = text.lower()
+        matches = self._positions_lower(text_lower)
+        if len(text_lower) != len(text):
+            # Some characters lowercase to several ("İ" -> "i̇"): map back to the original ones
+            origin = [i for i, ch in enumerate(text) for _ in ch.lower()]
+            matches = [(origin[start], origin[end - 1] + 1, idx) for start, end, idx in matches]
+        return [(start, end, self.keyphrases[idx]) for start, end, idx in matches]
+
+    def _positions_lower(self, text_lower):
+        if self.word_boundary:
+            matches = self._word_matches(text_lower)
+        else:
+            matches = []
+            for idx, pattern in enumerate(self.patterns):
+                if not pattern:
+                    continue
+                pos = text_lower.find(pattern)
+                while pos != -1:
+                    matches.append((pos, pos + len(pattern), idx))
+                    pos = text_lower.find(pattern, pos + 1)
+            matches.sort()
+        return matches
+
+def as_matcher(keyphrases):
+    """Accept either a keyphrase list or an already built KeyphraseMatcher"""
+    if isinstance(keyphrases, KeyphraseMatcher):
+        return keyphrases
+    return KeyphraseMatcher(keyphrases)
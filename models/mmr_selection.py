@@ -1,57 +1,72 @@
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy.sparse import csr_matrix
 import numpy as np
 
+def _normalize_rows(embeddings):
+    """Unit-length rows; all-zero rows stay zero so their cosine similarity is 0"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.where(norms > 0, norms, 1.0)
+
+def _token_sets(sentences):
+    """Binary sentence x token matrix of the lowercased whitespace tokens, plus set sizes"""
+    vocabulary = {}
+    indptr = [0]
+    indices = []
+    for sentence in sentences:
+        tokens = {vocabulary.setdefault(token, len(vocabulary)) for token in sentence.lower().split()}
+        indices.extend(tokens)
+        indptr.append(len(indices))
+    matrix = csr_matrix(
+        (np.ones(len(indices), dtype=np.float32), indices, indptr),
+        shape=(len(sentences), max(len(vocabulary), 1))
+    )
+    return matrix, np.diff(indptr).astype(np.float32)
+
 def mmr_select_sentences(sentences, scores, sentence_embeddings, top_k=5, lambda_param=0.7):
     """Select sentences using Maximal Marginal Relevance for diversity"""
-    
+
     if len(sentences) == 0:
         return []
-    
+
     if len(sentences) <= top_k:
         return sentences
-    
-    selected_indices = []
-    remaining_indices = list(range(len(sentences)))
-    
+
+    relevance = lambda_param * np.asarray(scores, dtype=np.float64)
+
+    if sentence_embeddings is not None:
+        normalized = _normalize_rows(sentence_embeddings)
+
+        def similarity_to(idx):
+            return normalized @ normalized[idx]
+    else:
+        # Fallback: Jaccard token overlap from one sparse product per pick
+        token_matrix, set_sizes = _token_sets(sentences)
+
+        def similarity_to(idx):
+            intersection = (token_matrix @ token_matrix[idx].T).toarray().ravel()
+            union = set_sizes + set_sizes[idx] - intersection
+            return np.divide(intersection, union, out=np.zeros_like(union), where=union > 0)
+
     # Start with highest scoring sentence
-    first_idx = np.argmax(scores)
-    selected_indices.append(first_idx)
-    remaining_indices.remove(first_idx)
-    
+    first_idx = int(np.argmax(scores))
+    selected_indices = [first_idx]
+    available = np.ones(len(sentences), dtype=bool)
+    available[first_idx] = False
+
+    # Highest similarity of every sentence to anything selected so far
+    max_similarity = similarity_to(first_idx).astype(np.float64)
+
     # Select remaining sentences
-    while len(selected_indices) < top_k and remaining_indices:
-        mmr_scores = {}
-        
-        for idx in remaining_indices:
-            # Relevance component
-            relevance = scores[idx]
-            
-            # Diversity component (similarity to already selected)
-            if sentence_embeddings is not None:
-                selected_embs = sentence_embeddings[selected_indices]
-                candidate_emb = sentence_embeddings[idx].reshape(1, -1)
-                
-                similarities = cosine_similarity(candidate_emb, selected_embs)[0]
-                max_similarity = np.max(similarities)
-            else:
-                # Fallback: token overlap
-                candidate_tokens = set(sentences[idx].lower().split())
-                max_similarity = 0
-                for sel_idx in selected_indices:
-                    selected_tokens = set(sentences[sel_idx].lower().split())
-                    if len(candidate_tokens | selected_tokens) > 0:
-                        sim = len(candidate_tokens & selected_tokens) / len(candidate_tokens | selected_tokens)
-                        max_similarity = max(max_similarity, sim)
-            
-            # MMR formula
-            mmr = lambda_param * relevance - (1 - lambda_param) * max_similarity * 10
-            mmr_scores[idx] = mmr
-        
-        # Select best MMR score
-        best_idx = max(mmr_scores.items(), key=lambda x: x[1])[0]
+    while len(selected_indices) < top_k and available.any():
+        mmr = relevance - (1 - lambda_param) * max_similarity * 10
+        mmr[~available] = -np.inf
+
+        # argmax takes the first maximum, the same tie-break as before
+        best_idx = int(np.argmax(mmr))
         selected_indices.append(best_idx)
-        remaining_indices.remove(best_idx)
-    
+        available[best_idx] = False
+        np.maximum(max_similarity, similarity_to(best_idx), out=max_similarity)
+
     # Return sentences in original order
     selected_indices.sort()
-    return [sentences[i] for i in selected_indices]
\ No newline at end of file
+    return [sentences[i] for i in selected_indices]
@@ -1,68 +1,155 @@
 import fitz  # PyMuPDF
+import multiprocessing
+import os
 import re
-from collections import Counter
+import threading
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 
-def pdf_to_text_pymupdf(path):
+# Pages held back so repeated header/footer lines are known before a page is emitted
+HEADER_FOOTER_WINDOW = 8
+# A line seen more often than this is treated as a header/footer
+HEADER_FOOTER_MAX_REPEATS = 3
+
+# Parallel extraction: worker processes, the page count below which it
+# stays serial, and pages handed to a worker at a time
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", min(4, os.cpu_count() or 1)))
+PARALLEL_MIN_PAGES = 64
+PAGES_PER_SHARD = 16
+
+_SENTENCE_END_RE = re.compile(r'[.!?](?:\s|$)')
+
+# forkserver where the platform has it, spawn otherwise (Windows)
+_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+_extract_pools = {}
+_extract_pools_lock = threading.Lock()
+
+def _get_extract_pool(workers):
+    # forkserver or spawn: never fork the API process itself, which holds torch threads
+    with _extract_pools_lock:
+        pool = _extract_pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(_START_METHOD)
+            )
+            _extract_pools[workers] = pool
+        return pool
+
+def _extract_page_range(path, start, stop):
+    """Worker: open the document and extract raw text of pages [start, stop)"""
+    doc = fitz.open(path)
+    try:
+        return [doc[page_num].get_text("text") for page_num in range(start, stop)]
+    finally:
+        doc.close()
+
+def iter_raw_pages(path, workers=None):
     """
-    Extract text using PyMuPDF - often handles spacing better than pdfplumber
+    Yield raw page text in page order. Documents of PARALLEL_MIN_PAGES or
+    more are sharded across a process pool, with a bounded number of shards
+    in flight so an early stop wastes little work; smaller ones (or
+    workers=1) are read serially. The output is identical either way.
     """
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
     doc = fitz.open(path)
-    all_text = []
+    page_count = len(doc)
     
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        
-        # Extract text with proper spacing
-        text = page.get_text("text")
-        
-        if text:
-            all_text.append(text)
+    if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+        try:
+            for page in doc:
+                # Extract text with proper spacing
+                yield page.get_text("text")
+        finally:
+            doc.close()
+        return
     
     doc.close()
-    
-    full_text = "\n".join(all_text)
-    
-    # Clean the text
-    full_text = clean_extracted_text(full_text)
-    
-    return full_text
+    ranges = [
+        (start, min(start + PAGES_PER_SHARD, page_count))
+        for start in range(0, page_count, PAGES_PER_SHARD)
+    ]
+    pool = _get_extract_pool(workers)
+    in_flight = deque()
+    next_range = 0
+    
+    try:
+        while next_range < len(ranges) or in_flight:
+            while next_range < len(ranges) and len(in_flight) < 2 * workers:
+                start, stop = ranges[next_range]
+                in_flight.append(pool.submit(_extract_page_range, path, start, stop))
+                next_range += 1
+            
+            for text in in_flight.popleft().result():
+                yield text
+    finally:
+        for future in in_flight:
+            future.cancel()
 
+# Cleaning patterns, compiled once. Email and URL removal share one pass:
+# both only remove runs of non-space characters, so a single alternation
+# removes exactly what the two sequential passes did.
+_HYPHEN_BREAK_RE = re.compile(r'(\w+)-\s*\n\s*(\w+)')
+_EMAIL_OR_URL_RE = re.compile(r'\S+@\S+\.\S+|http[s]?://\S+|www\.\S+')
+_DOI_RE = re.compile(r'doi:\s*\S+', re.I)
+_PAGE_NUMBER_LINE_RE = re.compile(r'\n\s*\d+\s*\n')
+_PAGE_REFERENCE_RE = re.compile(r'\b(page|p\.)\s*\d+\b', re.I)
+_COPYRIGHT_RE = re.compile(r'[©®™].*?\n')
+_CAPTION_LINE_RE = re.compile(r'\n\s*(Figure|Table|Fig\.)\s+\d+[:\.].*?\n', re.I)
+_AFFILIATION_RE = re.compile(r'\d+\s*(Department|University|Institute|College).*?\n')
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+# Same result as [ \t]+ -> ' ' without rewriting every single space
+_HORIZONTAL_SPACE_RE = re.compile(r'[ \t]{2,}|\t')
+_NON_ASCII_RE = re.compile(r'[^\x00-\x7F\n]+')
 
-def clean_extracted_text(text):
+def _apply_cleaning_passes(text):
     """
-    Comprehensive text cleaning
+    The regex passes of the cleaner, in their original order. Passes whose
+    trigger characters are absent are skipped, which cannot change the
+    result.
     """
     # Fix hyphenated words at line breaks
-    text = re.sub(r'(\w+)-\s*\n\s*(\w+)', r'\1\2', text)
+    if '-' in text:
+        text = _HYPHEN_BREAK_RE.sub(r'\1\2', text)
     
-    # Remove email addresses
-    text = re.sub(r'\S+@\S+\.\S+', '', text)
-    
-    # Remove URLs
-    text = re.sub(r'http[s]?://\S+|www\.\S+', '', text)
+    # Remove email addresses and URLs
+    if '@' in text or 'http' in text or 'www.' in text:
+        text = _EMAIL_OR_URL_RE.sub('', text)
     
     # Remove DOIs
-    text = re.sub(r'doi:\s*\S+', '', text, flags=re.I)
+    text = _DOI_RE.sub('', text)
     
     # Remove page numbers (various formats)
-    text = re.sub(r'\n\s*\d+\s*\n', '\n', text)
-    text = re.sub(r'\b(page|p\.)\s*\d+\b', '', text, flags=re.I)
+    text = _PAGE_NUMBER_LINE_RE.sub('\n', text)
+    text = _PAGE_REFERENCE_RE.sub('', text)
     
     # Remove copyright symbols
-    text = re.sub(r'[©®™].*?\n', '', text)
+    if '©' in text or '®' in text or '™' in text:
+        text = _COPYRIGHT_RE.sub('', text)
     
     # Remove figure/table references that are standalone
-    text = re.sub(r'\n\s*(Figure|Table|Fig\.)\s+\d+[:\.].*?\n', '\n', text, flags=re.I)
+    text = _CAPTION_LINE_RE.sub('\n', text)
     
     # Remove author affiliations (common patterns)
-    text = re.sub(r'\d+\s*(Department|University|Institute|College).*?\n', '', text)
+    text = _AFFILIATION_RE.sub('', text)
     
     # Remove excessive whitespace
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    text = re.sub(r'[ \t]+', ' ', text)
+    if '\n\n\n' in text:
+        text = _BLANK_LINES_RE.sub('\n\n', text)
+    text = _HORIZONTAL_SPACE_RE.sub(' ', text)
     
     # Remove non-ASCII
-    text = re.sub(r'[^\x00-\x7F\n]+', '', text)
+    if not text.isascii():
+        text = _NON_ASCII_RE.sub('', text)
+    
+    return text
+
+def clean_extracted_text(text):
+    """
+    Comprehensive text cleaning
+    """
+    text = _apply_cleaning_passes(text)
     
     # Remove headers/footers (repeated lines)
     lines = text.split('\n')
@@ -82,13 +169,79 @@ def clean_extracted_text(text):
         
         cleaned_lines.append(line)
     
-    # Rejoin with single space
-    full_text = ' '.join(cleaned_lines)
+    # Rejoin and collapse whitespace (str.split() and \s agree on what whitespace is)
+    return ' '.join(' '.join(cleaned_lines).split())
+
+
+def _clean_page_lines(page_text):
+    """
+    Line-oriented cleaning of a single page: the same passes as
+    clean_extracted_text, then the stripped lines long enough to keep.
+    Header/footer removal happens across pages in iter_cleaned_pages.
+    """
+    # Pad like the page would be inside the joined document so edge patterns still match
+    text = _apply_cleaning_passes("\n" + page_text + "\n")
     
-    # Final cleanup
-    full_text = re.sub(r'\s+', ' ', full_text).strip()
+    lines = (line.strip() for line in text.split('\n'))
+    return [line for line in lines if len(line) >= 5]
+
+
+def iter_cleaned_pages(path, header_footer_window=HEADER_FOOTER_WINDOW, workers=None):
+    """
+    Yield cleaned text page by page. Header/footer lines are detected with
+    a running count over the pages read so far; the first
+    header_footer_window pages are held back so repeats are known before
+    anything is emitted. Stop iterating to stop extracting.
+    """
+    line_counts = Counter()
+    pending = deque()
+    
+    def emit(lines):
+        kept = [line for line in lines if line_counts[line] <= HEADER_FOOTER_MAX_REPEATS]
+        return ' '.join(' '.join(kept).split())
+    
+    raw_pages = iter_raw_pages(path, workers=workers)
+    try:
+        for page_text in raw_pages:
+            lines = _clean_page_lines(page_text)
+            line_counts.update(lines)
+            pending.append(lines)
+            
+            if len(pending) > header_footer_window:
+                yield emit(pending.popleft())
+        
+        while pending:
+            yield emit(pending.popleft())
+    finally:
+        raw_pages.close()
+
+
+def pdf_to_text_streaming(path, max_chars=None, max_sentences=None, workers=None):
+    """
+    Extract and clean pages only until the character or sentence budget
+    is reached, instead of cleaning the whole document and truncating it.
+    """
+    parts = []
+    total_chars = 0
+    total_sentences = 0
     
-    return full_text
+    for page_text in iter_cleaned_pages(path, workers=workers):
+        if not page_text:
+            continue
+        
+        parts.append(page_text)
+        total_chars += len(page_text) + 1
+        total_sentences += len(_SENTENCE_END_RE.findall(page_text))
+        
+        if max_chars is not None and total_chars >= max_chars:
+            break
+        if max_sentences is not None and total_sentences >= max_sentences:
+            break
+    
+    text = ' '.join(parts)
+    if max_chars is not None:
+        text = text[:max_chars]
+    return text
 
 
 # Alternative Solution 2: Use pdfminer.six - Most reliable for text extraction
@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+
+BERT_MODEL_NAME = "bert-base-uncased"
+SBERT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Which checkpoint backs which stage. Chunking always uses the embedding
+# model's tokenizer so token budgets match what the encoder sees. Pinning
+# keyphrases to the embedding model makes one encoder serve both stages.
+STAGE_MODELS = {
+    "embeddings": os.environ.get("PDFSUM_EMBEDDING_MODEL", BERT_MODEL_NAME),
+    "keyphrases": os.environ.get("PDFSUM_KEYPHRASE_MODEL", SBERT_MODEL_NAME),
+}
+
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "punkt_tab": "tokenizers/punkt_tab/english/",
+}
+
+_instances = {}
+_key_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _lock_for(key):
+    with _registry_lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def _get_or_load(key, loader):
+    """Load each instance once, on first use; concurrent callers wait for the same load"""
+    instance = _instances.get(key)
+    if instance is not None:
+        return instance
+
+    with _lock_for(key):
+        instance = _instances.get(key)
+        if instance is None:
+            start = time.perf_counter()
+            instance = loader()
+            with _registry_lock:
+                _instances[key] = instance
+            print(f"   Loaded {key} in {time.perf_counter() - start:.2f}s")
+    return instance
+
+
+def from_pretrained(cls, name, **kwargs):
+    """Prefer the local cache so warm starts make no network calls"""
+    try:
+        return cls.from_pretrained(name, local_files_only=True, **kwargs)
+    except OSError:
+        return cls.from_pretrained(name, **kwargs)
+
+
+def stage_model(stage):
+    """Checkpoint name pinned to a pipeline stage"""
+    return STAGE_MODELS[stage]
+
+
+def shares_encoder(stage):
+    """True when a stage is pinned to the same checkpoint as the embeddings stage"""
+    return stage_model(stage) == stage_model("embeddings")
+
+
+def get_device():
+    import torch
+    return _get_or_load(
+        "device",
+        lambda: torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    )
+
+
+def get_tokenizer(name):
+    def load():
+        from transformers import AutoTokenizer
+        return from_pretrained(AutoTokenizer, name, use_fast=True)
+    return _get_or_load(f"tokenizer:{name}", load)
+
+
+def get_model(name):
+    def load():
+        from transformers import AutoModel
+        return from_pretrained(AutoModel, name).to(get_device()).eval()
+    return _get_or_load(f"model:{name}", load)
+
+
+def get_sentence_transformer(name):
+    def load():
+        from sentence_transformers import SentenceTransformer
+        try:
+            return SentenceTransformer(name, device=str(get_device()), local_files_only=True)
+        except OSError:
+            return SentenceTransformer(name, device=str(get_device()))
+    return _get_or_load(f"sentence-transformer:{name}", load)
+
+
+def get_embedding_model():
+    return get_model(stage_model("embeddings"))
+
+
+def get_embedding_encoder():
+    """Embedding-stage encoder behind the configured inference backend (see encoder_backends)"""
+    def load():
+        from transformers import AutoConfig, AutoModel
+        from models.encoder_backends import load_encoder, ENCODER_BACKEND
+
+        name = stage_model("embeddings")
+        return load_encoder(
+            ENCODER_BACKEND, name, get_embedding_tokenizer(), get_device(),
+            load_model=get_embedding_model,
+            load_cpu_model=lambda: from_pretrained(AutoModel, name).eval(),
+            load_config=lambda: from_pretrained(AutoConfig, name)
+        )
+    return _get_or_load("encoder", load)
+
+
+def embedding_model_key():
+    """
+    Checkpoint name plus the inference backend when it is not eager torch;
+    embedding caches key on it because quantized vectors differ slightly.
+    """
+    from models.encoder_backends import ENCODER_BACKEND
+
+    name = stage_model("embeddings")
+    return name if ENCODER_BACKEND == "torch" else f"{name}@{ENCODER_BACKEND}"
+
+
+def get_embedding_tokenizer():
+    """Tokenizer of the embedding model, shared by chunking and embeddings"""
+    return get_tokenizer(stage_model("embeddings"))
+
+
+def get_keybert():
+    """
+    KeyBERT over the keyphrase-stage model. When that model is the
+    embedding model, the already-loaded encoder serves both stages instead
+    of loading a second copy.
+    """
+    def load():
+        from keybert import KeyBERT
+        from models.keybert_backend import CachedSentenceTransformerBackend, SharedEncoderBackend
+
+        if shares_encoder("keyphrases"):
+            backend = SharedEncoderBackend()
+        else:
+            name = stage_model("keyphrases")
+            backend = CachedSentenceTransformerBackend(get_sentence_transformer(name), name)
+        return KeyBERT(model=backend)
+    return _get_or_load("keybert", load)
+
+
+_nltk_ready = False
+
+def ensure_nltk_data():
+    """Download the sentence tokenizer data only if it is not already installed"""
+    global _nltk_ready
+    if _nltk_ready:
+        return
+
+    import nltk
+    with _lock_for("nltk"):
+        if _nltk_ready:
+            return
+        for package, resource in NLTK_RESOURCES.items():
+            try:
+                nltk.data.find(resource)
+            except LookupError:
+                nltk.download(package, quiet=True)
+        _nltk_ready = True
+
+
+def warm_up():
+    """
+    Load every model the pipeline needs so the first request does not pay
+    for it. Returns load time per component in seconds.
+    """
+    timings = {}
+    for name, loader in [
+        ("nltk", ensure_nltk_data),
+        ("tokenizer", get_embedding_tokenizer),
+        ("embedding_encoder", get_embedding_encoder),
+        ("keybert", get_keybert),
+    ]:
+        start = time.perf_counter()
+        loader()
+        timings[name] = round(time.perf_counter() - start, 3)
+    return timings
+
+
+def loaded():
+    """Names of the instances loaded so far"""
+    with _registry_lock:
+        return sorted(_instances)
+
+
+def _process_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return round(resident_pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def memory_report():
+    """
+    Footprint of every loaded instance: parameter count and tensor bytes
+    for models, vocabulary size for tokenizers, plus the process RSS. The
+    encoder is listed when its backend holds weights of its own (int8,
+    ONNX); the torch backend runs the embedding model listed already.
+    """
+    from models.encoder_backends import ENCODER_BACKEND
+
+    # Snapshot, so a model loading meanwhile does not change the dict under us
+    with _registry_lock:
+        instances = sorted(_instances.items())
+
+    models = {}
+    for key, instance in instances:
+        if key == "encoder":
+            if ENCODER_BACKEND != "torch":
+                models[key] = instance.footprint()
+        elif hasattr(instance, "parameters"):
+            tensors = list(instance.parameters()) + list(instance.buffers())
+            models[key] = {
+                "parameters": sum(t.numel() for t in instance.parameters()),
+                "size_mb": round(sum(t.numel() * t.element_size() for t in tensors) / 2**20, 1)
+            }
+        elif key.startswith("tokenizer:"):
+            models[key] = {"vocab_size": len(instance)}
+
+    return {
+        "stage_models": dict(STAGE_MODELS),
+        "encoder_backend": ENCODER_BACKEND,
+        "loaded": models,
+        "process_rss_mb": _process_rss_mb()
+    }
@@ -1,70 +1,95 @@
+from models.keyphrase_matcher import KeyphraseMatcher, as_matcher
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import re
 
+IMPORTANT_SECTIONS = [
+    'abstract', 'introduction', 'conclusion', 'result', 'finding',
+    'method', 'approach', 'propose', 'present', 'demonstrate',
+    'show', 'achieve', 'improve', 'framework', 'model', 'system'
+]
+SECTION_MATCHER = KeyphraseMatcher(IMPORTANT_SECTIONS)
+
+STRUCTURE_PUNCTUATION = ' .,;:!?'
+
+_CITATION_RE = re.compile(r'\[\d+\]|\(\d{4}\)|et al\.')
+_CAPTION_RE = re.compile(r'^(Table|Figure|Fig\.|Equation)\s+\d', re.I)
+
+def _first_chunk_norms(num_sentences, chunk_embeddings, chunks):
+    """Embedding norm of the first chunk that contains each sentence, 0 if none does"""
+    norms = np.zeros(num_sentences)
+    if not chunks or chunk_embeddings is None:
+        return norms
+
+    chunk_norms = np.linalg.norm(np.asarray(chunk_embeddings), axis=1)
+    first_chunk = np.full(num_sentences, -1)
+    # Walk chunks backwards so the earliest chunk wins
+    for chunk_idx in range(len(chunks) - 1, -1, -1):
+        indices = chunks[chunk_idx]['sentence_indices']
+        if indices:
+            first_chunk[indices] = chunk_idx
+
+    has_chunk = first_chunk >= 0
+    norms[has_chunk] = chunk_norms[first_chunk[has_chunk]]
+    return norms
+
 def compute_comprehensive_scores(sentences, chunk_embeddings, chunks, keyphrases, text):
-    """Compute multi-factor sentence scores"""
-    
-    scores = np.zeros(len(sentences))
-    
-    for i, sent in enumerate(sentences):
-        score = 0.0
-        sent_lower = sent.lower()
-        
-        # Factor 1: Keyphrase matching (HIGHEST WEIGHT)
-        kp_matches = sum(1 for kp in keyphrases if kp.lower() in sent_lower)
-        score += kp_matches * 5.0
-        
-        # Factor 2: Important section keywords
-        important_sections = [
-            'abstract', 'introduction', 'conclusion', 'result', 'finding',
-            'method', 'approach', 'propose', 'present', 'demonstrate',
-            'show', 'achieve', 'improve', 'framework', 'model', 'system'
-        ]
-        section_matches = sum(1 for keyword in important_sections if keyword in sent_lower)
-        score += section_matches * 2.0
-        
-        # Factor 3: Position bias (favor earlier sentences slightly)
-        position_score = 1.0 / (1.0 + i * 0.01)
-        score += position_score * 1.0
-        
-        # Factor 4: Sentence length (prefer medium-length sentences)
-        words = sent.split()
-        word_count = len(words)
-        if 10 <= word_count <= 35:
-            score += 2.0
-        elif 8 <= word_count <= 40:
-            score += 1.0
-        elif word_count < 5:
-            score -= 2.0  # Penalize very short sentences
-        
-        # Factor 5: Sentence structure quality
-        # Prefer sentences that start with capital and end with period
-        if sent[0].isupper() and sent[-1] in '.!?':
-            score += 1.0
-        
-        # Penalize sentences with too many numbers/symbols
-        non_alpha = sum(1 for c in sent if not c.isalnum() and c not in ' .,;:!?')
-        if non_alpha > len(sent) * 0.2:
-            score -= 1.0
-        
-        # Factor 6: Chunk embedding relevance
-        # Find which chunk contains this sentence
-        for chunk_idx, chunk_info in enumerate(chunks):
-            if i in chunk_info['sentence_indices']:
-                # Use chunk embedding magnitude as relevance signal
-                chunk_emb_score = np.linalg.norm(chunk_embeddings[chunk_idx])
-                score += chunk_emb_score * 0.3
-                break
-        
-        # Factor 7: Avoid reference/citation sentences
-        if re.search(r'\[\d+\]|\(\d{4}\)|et al\.', sent):
-            score -= 1.5
-        
-        # Factor 8: Avoid table/figure captions
-        if re.match(r'^(Table|Figure|Fig\.|Equation)\s+\d', sent, re.I):
-            score -= 3.0
-        
-        scores[i] = max(0, score)  # Ensure non-negative
-    
-    return scores
\ No newline at end of file
+    """
+    Compute multi-factor sentence scores. keyphrases may be a list or a
+    KeyphraseMatcher built once for the document. Without chunk_embeddings
+    (None) the embedding factor is 0 and only the heuristics score.
+    """
+
+    if not sentences:
+        return np.zeros(0)
+
+    # Factor 1: Keyphrase matching (HIGHEST WEIGHT)
+    kp_matches = as_matcher(keyphrases).counts(sentences)
+
+    # Factor 2: Important section keywords
+    section_matches = SECTION_MATCHER.counts(sentences)
+
+    # Factor 3: Position bias (favor earlier sentences slightly)
+    position_score = 1.0 / (1.0 + np.arange(len(sentences)) * 0.01)
+
+    # Factor 4: Sentence length (prefer medium-length sentences)
+    word_count = np.array([len(sent.split()) for sent in sentences])
+    length_score = np.select(
+        [(word_count >= 10) & (word_count <= 35), (word_count >= 8) & (word_count <= 40), word_count < 5],
+        [2.0, 1.0, -2.0],  # Penalize very short sentences
+        default=0.0
+    )
+
+    # Factor 5: Sentence structure quality
+    # Prefer sentences that start with capital and end with period
+    structure_score = np.array([
+        1.0 if sent[0].isupper() and sent[-1] in '.!?' else 0.0 for sent in sentences
+    ])
+
+    # Penalize sentences with too many numbers/symbols
+    non_alpha = np.array([
+        len(sent) - sum(map(str.isalnum, sent)) - sum(sent.count(c) for c in STRUCTURE_PUNCTUATION)
+        for sent in sentences
+    ])
+    symbol_penalty = np.where(non_alpha > np.array([len(sent) for sent in sentences]) * 0.2, -1.0, 0.0)
+
+    # Factor 6: Chunk embedding relevance
+    # Use the embedding magnitude of the first chunk holding the sentence
+    chunk_emb_score = _first_chunk_norms(len(sentences), chunk_embeddings, chunks)
+
+    # Factor 7: Avoid reference/citation sentences
+    citation_penalty = np.array([-1.5 if _CITATION_RE.search(sent) else 0.0 for sent in sentences])
+
+    # Factor 8: Avoid table/figure captions
+    caption_penalty = np.array([-3.0 if _CAPTION_RE.match(sent) else 0.0 for sent in sentences])
+
+    scores = (kp_matches * 5.0
+              + section_matches * 2.0
+              + position_score * 1.0
+              + length_score
+              + structure_score
+              + symbol_penalty
+              + chunk_emb_score * 0.3
+              + citation_penalty
+              + caption_penalty)
+
+    return np.maximum(scores, 0)  # Ensure non-negative
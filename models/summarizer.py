@@ -1,12 +1,11 @@
 import numpy as np
 import nltk
 from sklearn.metrics.pairwise import cosine_similarity
-
-nltk.download('punkt', quiet=True)
-nltk.download('punkt_tab', quiet=True)
+from models.registry import ensure_nltk_data
 
 def score_sentences_improved(text, chunk_embeddings, chunk_positions, keyphrases):
     """Improved sentence scoring using chunk embeddings and keyphrases"""
+    ensure_nltk_data()
     sentences = nltk.sent_tokenize(text)
     
     # Map sentences to their positions in text
@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+RESULT_CACHE_BACKEND = os.environ.get("RESULT_CACHE_BACKEND", "memory")  # "memory" or "redis"
+RESULT_CACHE_TTL = int(os.environ.get("RESULT_CACHE_TTL", 24 * 3600))
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 512))
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+
+class InMemoryResultBackend:
+    """In-process dict with per-entry TTL and LRU eviction past max_entries"""
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisResultBackend:
+    """
+    Redis-backed results shared between API processes. Entries expire
+    with the TTL; a sorted set of insertion times bounds the entry count.
+    Works with any redis-py compatible client (e.g. fakeredis).
+    """
+
+    def __init__(self, connection=None, max_entries=RESULT_CACHE_SIZE,
+                 ttl=RESULT_CACHE_TTL, prefix="pdfsum:result:"):
+        if connection is None:
+            from redis import Redis
+            connection = Redis.from_url(REDIS_URL)
+        self.redis = connection
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prefix = prefix
+        self.index_key = prefix + "index"
+
+    def get(self, key):
+        raw = self.redis.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def set(self, key, value):
+        pipe = self.redis.pipeline()
+        pipe.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+        pipe.zadd(self.index_key, {key: time.time()})
+        # Entries past their TTL are gone already; drop them from the index
+        pipe.zremrangebyscore(self.index_key, 0, time.time() - self.ttl)
+        pipe.execute()
+
+        overflow = self.redis.zcard(self.index_key) - self.max_entries
+        if overflow > 0:
+            oldest = self.redis.zrange(self.index_key, 0, overflow - 1)
+            if oldest:
+                names = [k.decode() if isinstance(k, bytes) else k for k in oldest]
+                self.redis.delete(*[self.prefix + name for name in names])
+                self.redis.zrem(self.index_key, *names)
+
+    def __len__(self):
+        return self.redis.zcard(self.index_key)
+
+
+class ResultCache:
+    """Summaries keyed by PDF content hash, request parameters and pipeline version"""
+
+    def __init__(self, backend, pipeline_version):
+        self.backend = backend
+        self.pipeline_version = pipeline_version
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, file_hash, summary_sentences, tier="full"):
+        key = f"{file_hash}:{summary_sentences}:{self.pipeline_version}"
+        # Full-tier keys keep their old form so existing entries stay valid
+        return key if tier == "full" else f"{key}:{tier}"
+
+    def get(self, file_hash, summary_sentences, tier="full"):
+        try:
+            value = self.backend.get(self.key(file_hash, summary_sentences, tier))
+        except Exception as e:
+            # A broken cache must never fail an upload
+            print(f"⚠️ Result cache lookup failed: {e}")
+            value = None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, file_hash, summary_sentences, value, tier="full"):
+        try:
+            self.backend.set(self.key(file_hash, summary_sentences, tier), value)
+        except Exception as e:
+            print(f"⚠️ Result cache store failed: {e}")
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+def make_result_cache(pipeline_version, backend=RESULT_CACHE_BACKEND):
+    """Build the result cache for the configured backend"""
+    if backend == "memory":
+        return ResultCache(InMemoryResultBackend(), pipeline_version)
+    if backend == "redis":
+        return ResultCache(RedisResultBackend(), pipeline_version)
+    raise ValueError(f"Unknown result cache backend: {backend}")
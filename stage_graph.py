@@ -0,0 +1,96 @@
+"""
+Small dependency-graph runner for the summarization pipeline.
+
+Each stage names the stages it depends on and receives their results as
+positional arguments. Stages whose dependencies are done run
+concurrently on a thread pool. Each stage runs in a copy of the caller's
+context, so contextvars set by the caller stay visible inside it. Torch
+forward passes release the GIL, so two encoder-bound stages overlap on
+CPU.
+"""
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+PIPELINE_STAGE_WORKERS = int(os.environ.get("PIPELINE_STAGE_WORKERS", 2))
+
+
+class Stage:
+    """A named step: fn(*results of deps) -> result"""
+
+    def __init__(self, name, fn, deps=()):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+
+
+def _check_order(stages):
+    """Stages must be listed so that every dependency comes first (this also rules out cycles)"""
+    seen = set()
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in seen]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on {missing}, which must be listed before it")
+        if stage.name in seen:
+            raise ValueError(f"Duplicate stage: {stage.name}")
+        seen.add(stage.name)
+
+
+def _timed(fn, args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run_stage_graph(stages, max_workers=PIPELINE_STAGE_WORKERS):
+    """
+    Run the stages, each as soon as its dependencies have finished.
+    Returns (results, timings): dicts keyed by stage name, timings in
+    seconds. With max_workers <= 1 the stages run in list order on the
+    calling thread.
+
+    If a stage raises, no further stages are started; the ones already
+    running are allowed to finish and the first exception is re-raised.
+    """
+    _check_order(stages)
+    results = {}
+    timings = {}
+
+    if max_workers <= 1:
+        for stage in stages:
+            results[stage.name], timings[stage.name] = _timed(
+                stage.fn, [results[dep] for dep in stage.deps]
+            )
+        return results, timings
+
+    pending = list(stages)
+    running = {}
+    error = None
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage") as pool:
+        while pending or running:
+            if error is None:
+                for stage in [s for s in pending if all(dep in results for dep in s.deps)]:
+                    pending.remove(stage)
+                    args = [results[dep] for dep in stage.deps]
+                    context = contextvars.copy_context()
+                    running[pool.submit(context.run, _timed, stage.fn, args)] = stage
+            else:
+                pending = []
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    results[stage.name], timings[stage.name] = future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+
+    if error is not None:
+        raise error
+    return results, timings
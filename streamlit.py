@@ -82,6 +82,39 @@ st.markdown("""
 
 # API Configuration
 API_URL = "http://127.0.0.1:8000"
+# The server sends keep-alives while it works, so only a silent connection times out
+STREAM_IDLE_TIMEOUT = 120
+
+PIPELINE_STAGE_LABELS = {
+    "extraction": "📄 Extracted {chars:,} characters",
+    "keyphrases": "🔑 Found {count} keyphrases",
+    "chunking": "🧩 Created {chunks} chunks from {sentences} sentences",
+    "fast_summary": "⚡ Quick summary ready ({sentences} sentences)",
+    "embeddings": "🧠 Computed embeddings for {chunks} chunks",
+    "scoring": "📊 Scored {sentences} sentences",
+    "selection": "🎯 Selected {sentences} summary sentences",
+}
+
+def iter_sse(response):
+    """(event, data) pairs from a Server-Sent Events response"""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith(":"):
+            continue  # keep-alive
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+def render_keyphrases(keyphrases):
+    st.markdown("".join([
+        f'<span class="keyphrase-tag">{kp}</span>'
+        for kp in keyphrases
+    ]), unsafe_allow_html=True)
 
 # Header
 st.markdown('<h1 class="main-header">📚 Academic PDF Summarizer</h1>', unsafe_allow_html=True)
@@ -102,6 +135,17 @@ with st.sidebar:
         help="Number of sentences to extract for the summary"
     )
     
+    summary_mode = st.radio(
+        "Summary Mode",
+        options=["both", "fast", "full"],
+        format_func={
+            "both": "⚡ Quick, then refined",
+            "fast": "⚡ Quick only (no embeddings)",
+            "full": "🧠 Refined only"
+        }.get,
+        help="The quick summary uses heuristic scores only and arrives in about a second"
+    )
+    
     st.markdown("---")
     
     st.subheader("🎯 Key Features")
@@ -139,7 +183,7 @@ with st.sidebar:
             st.error("❌ API Error")
     except:
         st.error("❌ API Offline")
-        st.caption("Start with: `python main.py`")
+        st.caption("Start with: `python app.py`")
 
 # Main Content
 st.markdown("### 📤 Upload Your Document")
@@ -190,37 +234,84 @@ if uploaded_file:
                     st.error("❌ API not responding. Please start the FastAPI server.")
                     st.stop()
                 
-                # Upload and process
+                # Upload and follow the pipeline's progress events
                 status_text.text("📤 Uploading document...")
-                progress_bar.progress(20)
+                progress_bar.progress(15)
                 
                 files = {"file": (uploaded_file.name, uploaded_file.getvalue(), "application/pdf")}
-                params = {"summary_sentences": summary_length}
+                params = {"summary_sentences": summary_length, "tier": summary_mode}
                 
-                status_text.text("🔄 Processing (this may take 30-60 seconds)...")
-                progress_bar.progress(40)
+                early_summary = st.empty()
+                early_keyphrases = st.empty()
+                data = None
+                error_status, error_data = None, None
+                finished_stages = set()
+                total_stages = len(PIPELINE_STAGE_LABELS)
+                stage_fraction = 0.0
                 
                 start_time = time.time()
-                response = requests.post(
-                    f"{API_URL}/upload",
+                with requests.post(
+                    f"{API_URL}/upload/stream",
                     files=files,
                     params=params,
-                    timeout=180
-                )
+                    stream=True,
+                    timeout=(10, STREAM_IDLE_TIMEOUT)
+                ) as response:
+                    if response.status_code != 200:
+                        error_status, error_data = response.status_code, response.json()
+                    else:
+                        for event, payload in iter_sse(response):
+                            stage = payload.get("stage")
+                            if event == "stage" and stage == "queued":
+                                total_stages = len(payload.get("stages", PIPELINE_STAGE_LABELS))
+                            if event == "stage" and stage in PIPELINE_STAGE_LABELS:
+                                finished_stages.add(stage)
+                                stage_fraction = 0.0
+                                status_text.text(PIPELINE_STAGE_LABELS[stage].format(**payload))
+                                if stage == "keyphrases":
+                                    # Cheap results first: show keyphrases while embeddings run
+                                    with early_keyphrases.container():
+                                        st.markdown("**🔑 Key concepts (summary in progress...)**")
+                                        render_keyphrases(payload.get("keyphrases", []))
+                                elif stage == "fast_summary" and summary_mode == "both":
+                                    with early_summary.container():
+                                        st.markdown("**⚡ Quick summary (refining...)**")
+                                        st.markdown(
+                                            f'<div class="summary-box">{payload.get("summary", "")}</div>',
+                                            unsafe_allow_html=True
+                                        )
+                            elif event == "stage":
+                                status_text.text("🔄 Processing...")
+                            elif event == "progress":
+                                stage_fraction = payload["done"] / max(payload["total"], 1)
+                                status_text.text(f"🧠 Embedding {payload['done']}/{payload['total']} texts...")
+                            elif event == "result":
+                                data = payload
+                            elif event == "error":
+                                error_status, error_data = payload.get("status_code", 500), payload
+                            
+                            completed = len(finished_stages) + stage_fraction
+                            progress_bar.progress(min(99, 15 + int(85 * completed / total_stages)))
+                    
+                    if data is None and error_status is None:
+                        error_status, error_data = 502, {"detail": "Stream ended before a result arrived"}
                 processing_time = time.time() - start_time
                 
                 progress_bar.progress(100)
                 status_text.empty()
+                early_summary.empty()
+                early_keyphrases.empty()
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    
+                if data is not None:
                     st.balloons()
                     st.success(f"✅ Summary generated in {processing_time:.1f} seconds!")
                     
                     # Summary Section
                     st.markdown("---")
-                    st.markdown("## 📝 Extractive Summary")
+                    if data.get("tier") == "fast":
+                        st.markdown("## 📝 Extractive Summary (quick)")
+                    else:
+                        st.markdown("## 📝 Extractive Summary")
                     
                     summary_text = data.get("summary", "")
                     if summary_text:
@@ -237,11 +328,7 @@ if uploaded_file:
                     
                     keyphrases = data.get("keyphrases", [])
                     if keyphrases:
-                        keyphrase_html = "".join([
-                            f'<span class="keyphrase-tag">{kp}</span>'
-                            for kp in keyphrases
-                        ])
-                        st.markdown(keyphrase_html, unsafe_allow_html=True)
+                        render_keyphrases(keyphrases)
                     else:
                         st.info("No keyphrases extracted")
                     
@@ -376,15 +463,14 @@ Generated by Academic PDF Summarizer v2.0
                         )
                     
                 else:
-                    error_data = response.json()
-                    st.error(f"❌ Error {response.status_code}: {error_data.get('detail', 'Unknown error')}")
+                    st.error(f"❌ Error {error_status}: {error_data.get('detail', 'Unknown error')}")
                     
                     with st.expander("🔍 View Error Details"):
                         st.json(error_data)
             
             except requests.exceptions.Timeout:
-                st.error("⏱️ Request timed out. The document might be too large or complex.")
-                st.info("💡 Try: Reduce summary length or upload a smaller document")
+                st.error(f"⏱️ The server sent nothing for {STREAM_IDLE_TIMEOUT} seconds and may have stopped.")
+                st.info("💡 Check the API logs, then try again")
             
             except requests.exceptions.ConnectionError:
                 st.error("❌ Cannot connect to API server")
@@ -392,7 +478,7 @@ Generated by Academic PDF Summarizer v2.0
                     <div class="warning-box">
                     <strong>⚠️ Server Not Running</strong><br>
                     Please start the FastAPI backend:<br>
-                    <code>python main.py</code><br>
+                    <code>python app.py</code><br>
                     The server should be available at http://127.0.0.1:8000
                     </div>
                 """, unsafe_allow_html=True)